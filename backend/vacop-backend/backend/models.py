@@ -2,6 +2,7 @@ from backend.extensions import db
 from datetime import datetime
 from sqlalchemy.dialects.postgresql import JSON
 from .extensions import db
+from backend.utils.telemetry_raw import expand_raw, typed_values
 
 class User(db.Model):
     __tablename__ = 'users'
@@ -12,8 +13,11 @@ class User(db.Model):
 
 class Mission(db.Model):
     __tablename__ = 'missions'
+    __table_args__ = (db.Index('ix_missions_start_time_id', 'start_time', 'id'),)
+
     id = db.Column(db.Integer, primary_key=True)
-    status = db.Column(db.String(20), default='pending', nullable=False)
+    status = db.Column(db.String(20), default='pending', nullable=False, index=True)
+    robot_id = db.Column(db.String(64), default='robot_1', nullable=False, index=True)
     start_time = db.Column(db.DateTime, default=datetime.utcnow)
     end_time = db.Column(db.DateTime, nullable=True)
     destination = db.Column(JSON, nullable=False)
@@ -24,6 +28,7 @@ class Mission(db.Model):
         return {
             'id': self.id,
             'status': self.status,
+            'robot_id': self.robot_id,
             'start_time': self.start_time.isoformat() if self.start_time else None,
             'end_time': self.end_time.isoformat() if self.end_time else None,
             'destination': self.destination,
@@ -32,6 +37,9 @@ class Mission(db.Model):
 
 class Log(db.Model):
     __tablename__ = 'logs'
+    # Keyset pagination on (timestamp, id), see utils/pagination.py
+    __table_args__ = (db.Index('ix_logs_timestamp_id', 'timestamp', 'id'),)
+
     id = db.Column(db.Integer, primary_key=True)
     timestamp = db.Column(db.DateTime, default=datetime.utcnow)
     level = db.Column(db.String(10), nullable=False)
@@ -52,6 +60,15 @@ class Log(db.Model):
 
 class RobotPosition(db.Model):
     __tablename__ = "robot_positions"
+    # Keyset pagination of the history per robot on (ts, id).
+    # INCLUDE covers the served columns so history pages are index-only scans.
+    __table_args__ = (
+        db.Index(
+            "ix_robot_positions_robot_ts_id",
+            "robot_id", "ts", "id",
+            postgresql_include=["lat", "lng", "topic"],
+        ),
+    )
 
     id = db.Column(db.Integer, primary_key=True)
     robot_id = db.Column(db.String(64), nullable=False, index=True, default="robot_1")
@@ -61,7 +78,10 @@ class RobotPosition(db.Model):
     lng = db.Column(db.Float, nullable=False)
 
     topic = db.Column(db.String(256), nullable=True)
-    raw = db.Column(db.JSON, nullable=True)   # store the original JSON if you want
+    # Original message, kept per TELEMETRY_RAW_POLICY (utils/telemetry_raw.py):
+    # raw = JSON (whole message, or without the fields these columns give back), raw_z = deflated whole message.
+    raw = db.Column(db.JSON(none_as_null=True), nullable=True)
+    raw_z = db.Column(db.LargeBinary, nullable=True)
 
     def to_dict(self):
         return {
@@ -71,4 +91,32 @@ class RobotPosition(db.Model):
             "lat": self.lat,
             "lng": self.lng,
             "topic": self.topic,
-        }
\ No newline at end of file
+        }
+
+    def raw_payload(self):
+        """Stored original message (decompressed), None if not kept."""
+        return expand_raw(self.raw, self.raw_z, typed_values(self.robot_id, self.lat, self.lng))
+
+class Zone(db.Model):
+    """Geofence polygon checked against every GNSS fix (services/geofence_service.py)."""
+    __tablename__ = "zones"
+
+    id = db.Column(db.Integer, primary_key=True)
+    name = db.Column(db.String(80), nullable=False)
+    # "operating_area": alert when the robot leaves it, "restricted": alert when it enters
+    kind = db.Column(db.String(20), nullable=False, default="restricted")
+    polygon = db.Column(JSON, nullable=False)  # [[lat, lng], ...]
+    robot_id = db.Column(db.String(64), nullable=True)  # None = every robot
+    active = db.Column(db.Boolean, nullable=False, default=True)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    def to_dict(self):
+        return {
+            "id": self.id,
+            "name": self.name,
+            "kind": self.kind,
+            "polygon": self.polygon,
+            "robot_id": self.robot_id,
+            "active": self.active,
+            "created_at": self.created_at.isoformat() if self.created_at else None,
+        }
@@ -0,0 +1,86 @@
+from flask import Blueprint, request, jsonify
+from flask_jwt_extended import jwt_required
+from backend.models import Zone
+from backend.extensions import db
+from backend.routes.mission import admin_required
+from backend.utils.lazy import lazy_import
+
+geofence_service = lazy_import("backend.services.geofence_service")
+
+geofence_bp = Blueprint('geofence', __name__, url_prefix='/api/geofence')
+
+
+def _zone_fields(data, partial=False):
+    """Validate zone fields from a JSON body, raise ValueError (or TypeError) with a readable message."""
+    fields = {}
+    if 'name' in data or not partial:
+        name = data.get('name')
+        if not isinstance(name, str) or not name.strip():
+            raise ValueError("name is required")
+        fields['name'] = name.strip()[:80]
+    if 'kind' in data or not partial:
+        kind = data.get('kind', 'restricted')
+        if kind not in geofence_service.ZONE_KINDS:
+            raise ValueError(f"kind must be one of {', '.join(geofence_service.ZONE_KINDS)}")
+        fields['kind'] = kind
+    if 'polygon' in data or not partial:
+        fields['polygon'] = geofence_service.validate_polygon(data.get('polygon'))
+    if 'robot_id' in data:
+        fields['robot_id'] = str(data['robot_id']) if data['robot_id'] is not None else None
+    if 'active' in data:
+        if not isinstance(data['active'], bool):
+            raise ValueError("active must be true or false")
+        fields['active'] = data['active']
+    return fields
+
+
+@geofence_bp.route('/zones', methods=['GET'])
+@jwt_required()
+def list_zones():
+    zones = Zone.query.order_by(Zone.id).all()
+    return jsonify([z.to_dict() for z in zones]), 200
+
+
+@geofence_bp.route('/zones', methods=['POST'])
+@admin_required
+def create_zone():
+    try:
+        fields = _zone_fields(request.get_json(silent=True) or {})
+    except (TypeError, ValueError) as e:
+        return jsonify({"msg": str(e)}), 400
+
+    zone = Zone(**fields)
+    db.session.add(zone)
+    db.session.commit()
+    geofence_service.invalidate_zones()
+    return jsonify(zone.to_dict()), 201
+
+
+@geofence_bp.route('/zones/<int:zone_id>', methods=['PATCH'])
+@admin_required
+def update_zone(zone_id):
+    zone = db.session.get(Zone, zone_id)
+    if zone is None:
+        return jsonify({"msg": "Zone introuvable"}), 404
+    try:
+        fields = _zone_fields(request.get_json(silent=True) or {}, partial=True)
+    except (TypeError, ValueError) as e:
+        return jsonify({"msg": str(e)}), 400
+
+    for key, value in fields.items():
+        setattr(zone, key, value)
+    db.session.commit()
+    geofence_service.invalidate_zones()
+    return jsonify(zone.to_dict()), 200
+
+
+@geofence_bp.route('/zones/<int:zone_id>', methods=['DELETE'])
+@admin_required
+def delete_zone(zone_id):
+    zone = db.session.get(Zone, zone_id)
+    if zone is None:
+        return jsonify({"msg": "Zone introuvable"}), 404
+    db.session.delete(zone)
+    db.session.commit()
+    geofence_service.invalidate_zones()
+    return jsonify({"ok": True}), 200
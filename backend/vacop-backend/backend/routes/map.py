@@ -1,77 +1,303 @@
-from flask import Blueprint, send_file, jsonify, current_app
+from flask import Blueprint, send_file, jsonify, current_app, request, Response
+from flask_jwt_extended import verify_jwt_in_request
+import io
+import math
 import os
-from backend.services.map_service import build_occupancy_grid, save_grid_png
+from backend.utils.lazy import lazy_import
+
+# Loaded on first use (or by the startup prewarm): NumPy and the map stack are not needed to start serving
+np = lazy_import("numpy")
+map_registry = lazy_import("backend.services.map_registry")
+map_service = lazy_import("backend.services.map_service")
+elevation_service = lazy_import("backend.services.elevation_service")
+pointcloud_service = lazy_import("backend.services.pointcloud_service")
+planning_service = lazy_import("backend.services.planning_service")
+geo_projection = lazy_import("backend.services.geo_projection")
 
 map_bp = Blueprint('map', __name__, url_prefix='/api/map')
 
-# Cache for map metadata
-start_info = {}
-
-def get_db_path():
-    # Priority: Env var > Relative path
-    env_path = os.environ.get('DB_PATH')
-    if env_path:
-        return env_path
-
-    # Fallback to relative path detection (Local dev)
-    # map.py is in backend/routes/
-    # If running from vacop-backend/, dirname is backend/routes
-    # We want ../../../instance/rtabmap...
-    return os.path.abspath(os.path.join(os.path.dirname(__file__), '../../../instance/rtabmap_26_02_1.db'))
-
-def get_static_map_path():
-    return os.path.join(current_app.instance_path, 'map_occupancy.png')
-
-def ensure_map_generated():
-    global start_info
-    db_path = get_db_path()
-    
-    # We will save the map to the instance folder used by Flask
-    os.makedirs(current_app.instance_path, exist_ok=True)
-    out_png = os.path.join(current_app.instance_path, 'map_occupancy.png')
-    
-    if not os.path.exists(out_png) or not start_info:
-        if not os.path.exists(db_path):
-             print(f"Advert: DB path not found at {db_path}")
-             return False
-
-        # Parameters (could be moved to config)
-        res = 0.05
-        padding = 1.0
-        
-        grid, min_x, min_y, resolution = build_occupancy_grid(
-            db_path=db_path,
-            resolution=res,
-            limit_nodes=None,
-            stride=1,
-            max_points_per_scan=20000,
-            padding_m=padding
-        )
-        
-        save_grid_png(grid, out_png)
-        
-        # Store metadata
-        # grid.shape is (height, width)
-        height, width = grid.shape
-        start_info = {
-            "origin_x": min_x,
-            "origin_y": min_y,
-            "resolution": resolution,
-            "width": width,
-            "height": height
-        }
-        print(f"Map generated: {width}x{height}, origin=({min_x:.3f}, {min_y:.3f})")
-    
-    return True
+def _requested_map(builds=True, with_z=True):
+    """
+    (map name, build params) from the query string: map, resolution, z_min, z_max, stride.
+
+    Params other than the defaults start a full build each: when the request may build (`builds`),
+    they require a logged-in user (401 otherwise). with_z=False leaves z_min/z_max to the caller (/bands).
+    """
+    args = request.args if with_z else {k: v for k, v in request.args.items() if k not in ('z_min', 'z_max')}
+    params = map_registry.parse_params(args)
+    if builds and params != map_registry.DEFAULT_PARAMS:
+        verify_jwt_in_request()
+    return request.args.get('map', map_registry.DEFAULT_MAP), params
+
+def _map_build_error(exc):
+    """JSON error for a failed map build (grid too big, no points, unreadable DB...)."""
+    print(f"[MAP] build failed: {exc}")
+    return jsonify({"error": f"Map generation failed: {exc}"}), 500
+
+@map_bp.route('/maps', methods=['GET'])
+def get_maps():
+    return jsonify({"maps": sorted(map_registry.list_maps()), "default": map_registry.DEFAULT_MAP,
+                    "cache": map_registry.cache_stats()})
 
 @map_bp.route('/image', methods=['GET'])
 def get_map_image():
-    if ensure_map_generated():
-        return send_file(os.path.join(current_app.instance_path, 'map_occupancy.png'), mimetype='image/png')
+    try:
+        name, params = _requested_map()
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    try:
+        built = map_registry.get_map(name, params)
+    except Exception as e:
+        return _map_build_error(e)
+    if built is not None:
+        return send_file(io.BytesIO(built.png), mimetype='image/png')
     return jsonify({"error": "Map generation failed or DB missing"}), 404
 
+@map_bp.route('/tile', methods=['GET'])
+def get_map_tile():
+    """
+    One square of the map image, encoded from the bit-packed grid (no full-size image needed).
+
+    tx, ty: tile column/row in image pixels / size (ty=0 is the top of the image, like /image)
+    size: tile side in pixels (64..4096, default 512); edge tiles are smaller.
+    """
+    try:
+        name, params = _requested_map()
+        tx = int(request.args.get('tx', 0))
+        ty = int(request.args.get('ty', 0))
+        size = int(request.args.get('size', 512))
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    if not 64 <= size <= 4096 or tx < 0 or ty < 0:
+        return jsonify({"error": "size must be within [64, 4096] and tx, ty >= 0"}), 400
+
+    try:
+        built = map_registry.get_map(name, params)
+    except Exception as e:
+        return _map_build_error(e)
+    if built is None:
+        return jsonify({"error": "Map generation failed or DB missing"}), 404
+
+    height, width = built.grid.shape
+    col0, row_top = tx * size, ty * size
+    if col0 >= width or row_top >= height:
+        return jsonify({"error": "Tile out of map"}), 404
+    # image row 0 is grid row height-1 (+y up)
+    window = (max(0, height - row_top - size), height - row_top, col0, min(width, col0 + size))
+    return send_file(io.BytesIO(map_service.encode_grid_png(built.grid, window)), mimetype='image/png')
+
 @map_bp.route('/info', methods=['GET'])
 def get_map_info():
-    if ensure_map_generated():
-        return jsonify(start_info)
+    try:
+        name, params = _requested_map()
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    try:
+        built = map_registry.get_map(name, params)
+    except Exception as e:
+        return _map_build_error(e)
+    if built is not None:
+        anchor = geo_projection.get_geo_anchor(current_app.config)
+        return jsonify({**built.info, "geo_anchor": anchor.to_dict() if anchor else None})
     return jsonify({"error": "Map generation failed"}), 404
+
+@map_bp.route('/bands', methods=['GET'])
+def get_map_bands():
+    """
+    2.5D products derived from the per-cell elevation statistics (no scan re-read once built).
+
+    Query: map, resolution, stride (as /image) and
+      - kind=info: JSON metadata of the elevation grid
+      - kind=occupancy&z_min=..&z_max=..: PNG occupancy of a height band (default 0.1 .. 1.5 m)
+      - kind=step&max_step=..: PNG of cells whose ground step exceeds max_step (default 0.15 m)
+      - kind=traversable&max_step=..&z_min=..&z_max=..: PNG, black where the robot cannot drive
+    """
+    try:
+        name, params = _requested_map(with_z=False)
+        kind = request.args.get('kind', 'occupancy')
+        z_min = float(request.args.get('z_min', 0.1))
+        z_max = float(request.args.get('z_max', 1.5))
+        max_step = float(request.args.get('max_step', 0.15))
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    if kind not in ('info', 'occupancy', 'step', 'traversable'):
+        return jsonify({"error": "kind must be info, occupancy, step or traversable"}), 400
+    if kind in ('occupancy', 'traversable') and z_min >= z_max:
+        return jsonify({"error": "z_min must be lower than z_max"}), 400
+
+    db_path = map_registry.list_maps().get(name)
+    if db_path is None or not os.path.exists(db_path):
+        return jsonify({"error": "Map DB missing"}), 404
+    try:
+        elev = elevation_service.get_elevation_grid(db_path, params.resolution, params.stride)
+    except Exception as e:
+        return _map_build_error(e)
+
+    if kind == 'info':
+        observed = elev.observed
+        height, width = elev.count.shape
+        return jsonify({
+            "map": name,
+            "origin_x": elev.origin_x,
+            "origin_y": elev.origin_y,
+            "resolution": elev.resolution,
+            "width": width,
+            "height": height,
+            "z_base": elev.z_base,
+            "slice_m": elev.slice_m,
+            "n_slices": elevation_service.N_SLICES,
+            "z_observed": [float(elev.min_z[observed].min()), float(elev.max_z[observed].max())] if observed.any() else None,
+        })
+
+    if kind == 'occupancy':
+        blocked = elev.occupancy(z_min, z_max)
+    elif kind == 'step':
+        blocked = (elev.step_map() > max_step).astype(np.uint8)
+    else:
+        blocked = (~elev.traversable(max_step, z_min, z_max)).astype(np.uint8)
+
+    buf = io.BytesIO()
+    map_service.save_grid_png(blocked, buf)
+    buf.seek(0)
+    return send_file(buf, mimetype='image/png')
+
+@map_bp.route('/pointcloud', methods=['GET'])
+def get_pointcloud():
+    """
+    Stream the voxel-downsampled site point cloud (map frame, meters).
+
+    Query: map (default "default"), lod (0 = coarsest .. 3, default 1), format ("bin" | "ply"),
+           bbox "xmin,ymin,zmin,xmax,ymax,zmax" (optional crop)
+    "bin" is raw little-endian float32 xyz; X-Point-Count / X-Voxel-Size give the layout.
+    202 {"status": "building"} (Retry-After) while the cloud of this lod is being built.
+    """
+    name = request.args.get('map', map_registry.DEFAULT_MAP)
+    lod = request.args.get('lod', 1, type=int)
+    fmt = request.args.get('format', 'bin')
+    if not 0 <= lod < len(pointcloud_service.LOD_VOXEL_M):
+        return jsonify({"error": f"lod must be within [0, {len(pointcloud_service.LOD_VOXEL_M) - 1}]"}), 400
+    if fmt not in ('bin', 'ply'):
+        return jsonify({"error": "format must be bin or ply"}), 400
+    try:
+        bbox = pointcloud_service.parse_bbox(request.args.get('bbox'))
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    db_path = map_registry.list_maps().get(name)
+    if db_path is None or not os.path.exists(db_path):
+        return jsonify({"error": "Map DB missing"}), 404
+
+    # the first request of a (map, lod) starts the build in the background: 202 until the file is ready
+    path, error = pointcloud_service.request_cloud(db_path, lod)
+    if error is not None:
+        return jsonify({"error": f"Point cloud build failed: {error}"}), 500
+    if path is None:
+        return jsonify({"status": "building", "map": name, "lod": lod}), 202, {"Retry-After": "5"}
+    headers = {"X-Voxel-Size": str(pointcloud_service.LOD_VOXEL_M[lod]),
+               "X-Point-Count": str(pointcloud_service.count_points(path, bbox))}
+    if fmt == 'ply':
+        return Response(pointcloud_service.stream_cloud(path, 'ply', bbox), mimetype='application/octet-stream', headers={
+            **headers, "Content-Disposition": f"attachment; filename={name}_lod{lod}.ply"})
+    return Response(pointcloud_service.stream_cloud(path, 'bin', bbox), mimetype='application/octet-stream', headers=headers)
+
+@map_bp.route('/project', methods=['POST'])
+def project_points():
+    """
+    Project GNSS points to the map frame in one vectorized pass.
+
+    Body JSON: { "points": [[lat, lng], ...] }
+    Response: { "x": [...], "y": [...], "px": [...], "py": [...] } (px/py if the map is available)
+    """
+    anchor = geo_projection.get_geo_anchor(current_app.config)
+    if anchor is None:
+        return jsonify({"error": "GEO_ANCHOR_LAT/GEO_ANCHOR_LNG are not set"}), 404
+
+    data = request.get_json(silent=True) or {}
+    try:
+        pts = np.asarray(data.get('points', []), dtype=np.float64)
+    except (TypeError, ValueError):
+        pts = None
+    if pts is not None and pts.size == 0:
+        pts = pts.reshape(0, 2)
+    if pts is None or pts.ndim != 2 or pts.shape[1] != 2:
+        return jsonify({"error": "points must be a list of [lat, lng]"}), 400
+
+    x, y = anchor.to_map(pts[:, 0], pts[:, 1])
+    out = {"x": np.round(x, 3).tolist(), "y": np.round(y, 3).tolist()}
+    try:
+        built = map_registry.get_cached_map(*_requested_map(builds=False))
+    except ValueError:
+        built = None
+    if built is not None:
+        px, py = geo_projection.map_to_pixels(x, y, built.info)
+        out["px"] = np.round(px, 1).tolist()
+        out["py"] = np.round(py, 1).tolist()
+    return jsonify(out)
+
+def get_planning_index_for_map(build=True):
+    """
+    Planning index of the default map (the one the vehicle navigates on), or None if it cannot be generated.
+
+    build=False never builds anything on the request: only an index already built on the cached or
+    persisted map is returned, otherwise None and the index is built in the background (/vehicle/goal).
+    """
+    radius = current_app.config["ROBOT_RADIUS_M"]
+    try:
+        built = map_registry.get_map() if build else map_registry.get_persisted_map()
+    except Exception as exc:
+        print(f"[PLAN] default map unavailable: {exc}")
+        return None
+    if built is None:
+        return None
+    if build:
+        return planning_service.get_planning_index(built.grid, built.info, radius)
+    index = planning_service.peek_planning_index(built.grid, radius)
+    if index is None:
+        planning_service.build_planning_index_later(built.grid, built.info, radius)
+    return index
+
+def _xy(obj):
+    """
+    Accept {x, y} or a ROS-like pose {pose: {position: {x, y}}}; None if absent or not numeric.
+    Raises ValueError on NaN / infinite coordinates.
+    """
+    if not isinstance(obj, dict):
+        return None
+    pos = obj.get('pose', {}).get('position', obj) if isinstance(obj.get('pose'), dict) else obj
+    try:
+        x, y = float(pos['x']), float(pos['y'])
+    except (KeyError, TypeError, ValueError, OverflowError):
+        return None
+    if not (math.isfinite(x) and math.isfinite(y)):
+        raise ValueError("x and y must be finite numbers")
+    return x, y
+
+@map_bp.route('/check', methods=['GET'])
+def check_point():
+    x = request.args.get('x', type=float)
+    y = request.args.get('y', type=float)
+    if x is None or y is None:
+        return jsonify({"error": "x and y are required"}), 400
+    if not (math.isfinite(x) and math.isfinite(y)):
+        return jsonify({"error": "x and y must be finite numbers"}), 400
+    index = get_planning_index_for_map()
+    if index is None:
+        return jsonify({"error": "Map generation failed"}), 404
+    return jsonify(index.check_point(x, y))
+
+@map_bp.route('/plan', methods=['POST'])
+def plan_path():
+    data = request.get_json(silent=True) or {}
+    try:
+        start = _xy(data.get('start'))
+        goal = _xy(data.get('goal'))
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    if start is None or goal is None:
+        return jsonify({"error": "start and goal {x, y} are required"}), 400
+
+    index = get_planning_index_for_map()
+    if index is None:
+        return jsonify({"error": "Map generation failed"}), 404
+    result = index.plan(start, goal)
+    return jsonify(result), 200 if result["ok"] else 422
@@ -3,6 +3,9 @@ from flask_jwt_extended import jwt_required, get_jwt
 from backend.models import Mission, Log
 from backend.extensions import db, socketio
 from backend.services.mqtt_service import mqtt_client
+from backend.services.mission_state import set_active_mission, clear_active_mission, get_active_mission_id
+from backend.utils.pagination import keyset_page
+from sqlalchemy.orm import joinedload
 from datetime import datetime
 import os 
 import json
@@ -27,11 +30,12 @@ def start_mission():
     data = request.get_json()
     current_user_id = get_jwt()["sub"]
     destination = data.get('destination')
+    robot_id = str(data.get('robot_id', 'robot_1'))
 
     if not destination:
         return jsonify({"msg": "Destination requise"}), 400
 
-    new_mission = Mission(status='active', destination=destination, user_id=current_user_id)
+    new_mission = Mission(status='active', destination=destination, user_id=current_user_id, robot_id=robot_id)
     db.session.add(new_mission)
     db.session.commit()
 
@@ -39,10 +43,13 @@ def start_mission():
     topic = f"{mqtt_path.rstrip('/')}/mission"
 
     if not mqtt_path:
+        set_active_mission(robot_id, new_mission.id)
         return jsonify({"ok": False, "error": "MQTT_PATH is not set"}), 500
 
     payload = {"mission_id": new_mission.id, "destination": destination, "action": "start"}
     mqtt_client.publish(topic, payload)
+    # The robot gets the mission first; the cache update never fails the request (Redis errors are logged).
+    set_active_mission(robot_id, new_mission.id)
 
     socketio.emit('mission_status', new_mission.to_dict())
     return jsonify(new_mission.to_dict()), 201
@@ -53,24 +60,73 @@ def abort_mission():
     mqtt_path = (current_app.config.get("MQTT_PATH") or "").strip()
     topic = f"{mqtt_path.rstrip('/')}/mission/abort"
     mqtt_client.publish(topic, {"action": "STOP_IMMEDIATE"})
-    active_mission = Mission.query.filter_by(status='active').first()
-    if active_mission:
+
+    # Active mission comes from the in-process cache, then a primary key lookup.
+    robot_id = str((request.get_json(silent=True) or {}).get('robot_id', 'robot_1'))
+    mission_id = get_active_mission_id(robot_id)
+    active_mission = db.session.get(Mission, mission_id, options=[joinedload(Mission.created_by)]) if mission_id else None
+    if active_mission and active_mission.status == 'active':
         active_mission.status = 'aborted'
         active_mission.end_time = datetime.utcnow()
         db.session.commit()
         socketio.emit('mission_status', active_mission.to_dict())
+    clear_active_mission(robot_id, mission_id)
     return jsonify({"msg": "Arrêt d'urgence envoyé"}), 200
 
+@mission_bp.route('/missions', methods=['GET'])
+@jwt_required()
+def list_missions():
+    status = request.args.get('status')
+    robot_id = request.args.get('robot_id')
+    limit = request.args.get('limit', 50, type=int)
+    cursor = request.args.get('cursor') or None
+
+    # Creators are joined in the same SELECT (no lazy load per mission in to_dict).
+    query = Mission.query.options(joinedload(Mission.created_by))
+    if status:
+        query = query.filter_by(status=status)
+    if robot_id:
+        query = query.filter_by(robot_id=robot_id)
+    try:
+        missions, next_cursor, prev_cursor = keyset_page(query, Mission.start_time, Mission.id, cursor, limit)
+    except ValueError:
+        return jsonify({"msg": "Curseur invalide"}), 400
+
+    resp = jsonify([m.to_dict() for m in missions])
+    if next_cursor:
+        resp.headers['X-Next-Cursor'] = next_cursor
+    if prev_cursor:
+        resp.headers['X-Prev-Cursor'] = prev_cursor
+    return resp, 200
+
+@mission_bp.route('/missions/<int:mission_id>', methods=['GET'])
+@jwt_required()
+def get_mission(mission_id):
+    mission = db.session.get(Mission, mission_id, options=[joinedload(Mission.created_by)])
+    if mission is None:
+        return jsonify({"msg": "Mission introuvable"}), 404
+    return jsonify(mission.to_dict()), 200
+
 @mission_bp.route('/logs', methods=['GET'])
 @jwt_required()
 def get_logs():
     level = request.args.get('level')
     limit = request.args.get('limit', 100, type=int)
-    query = Log.query.order_by(Log.timestamp.desc())
+    cursor = request.args.get('cursor') or None
+    query = Log.query
     if level:
         query = query.filter_by(level=level)
-    logs = query.limit(limit).all()
-    return jsonify([log.to_dict() for log in logs]), 200
+    try:
+        logs, next_cursor, prev_cursor = keyset_page(query, Log.timestamp, Log.id, cursor, limit)
+    except ValueError:
+        return jsonify({"msg": "Curseur invalide"}), 400
+
+    resp = jsonify([log.to_dict() for log in logs])
+    if next_cursor:
+        resp.headers['X-Next-Cursor'] = next_cursor
+    if prev_cursor:
+        resp.headers['X-Prev-Cursor'] = prev_cursor
+    return resp, 200
 
 @mission_bp.route('/goal', methods=['POST'])
 def publish_goal():
@@ -95,6 +151,21 @@ def publish_goal():
     if not goal_pose or not initial_pose:
         return jsonify({"msg": "Both goal_pose and initial_pose are required"}), 400
 
+    # Reject goals inside obstacles or in another region of the map before they reach the vehicle.
+    # Only an index that is already built is used: without one (no map yet, map build failing,
+    # index still building in the background) the goal is published unvalidated, as before.
+    from backend.routes.map import get_planning_index_for_map, _xy
+    try:
+        goal_xy = _xy(goal_pose)
+        initial_xy = _xy(initial_pose)
+    except ValueError as e:
+        return jsonify({"msg": str(e)}), 400
+    index = get_planning_index_for_map(build=False) if goal_xy is not None else None
+    if index is not None:
+        check = index.check_goal(initial_xy, goal_xy)
+        if not check["ok"]:
+            return jsonify({"msg": f"Goal rejected: {check['reason']}", **check}), 422
+
     try:
         from backend.services.mqtt_service import mqtt_client
         import json
@@ -1,12 +1,23 @@
 from datetime import datetime
-from flask import Blueprint, jsonify, request
+from flask import Blueprint, jsonify, request, current_app
+from sqlalchemy.orm import load_only
 
 from ..extensions import db
 from ..models import RobotPosition
 from ..services.telemetry_state import get_latest_position
+from ..utils.pagination import keyset_page
+from ..utils.lazy import lazy_import
+
+# NumPy and the map stack are only needed by /trajectory, loaded on first use
+np = lazy_import("numpy")
+geo_projection = lazy_import("backend.services.geo_projection")
+map_registry = lazy_import("backend.services.map_registry")
 
 telemetry_bp = Blueprint("telemetry", __name__, url_prefix="/api/telemetry")
 
+# Upper bound of `limit` on /history and /trajectory: one page is loaded and serialized in memory
+MAX_PAGE_LIMIT = 5000
+
 
 @telemetry_bp.get("/latest")
 def latest():
@@ -34,6 +45,38 @@ def latest():
         return jsonify(None)
 
 
+def _filter_window(q):
+    """Apply the optional since_ms/until_ms query params (epoch milliseconds) to a RobotPosition query."""
+    since_ms_raw = request.args.get("since_ms")
+    until_ms_raw = request.args.get("until_ms")
+
+    if since_ms_raw is not None:
+        try:
+            since_ms = float(since_ms_raw)
+            since_dt = datetime.utcfromtimestamp(since_ms / 1000.0)
+            q = q.filter(RobotPosition.ts >= since_dt)
+        except Exception:
+            pass
+
+    if until_ms_raw is not None:
+        try:
+            until_ms = float(until_ms_raw)
+            until_dt = datetime.utcfromtimestamp(until_ms / 1000.0)
+            q = q.filter(RobotPosition.ts <= until_dt)
+        except Exception:
+            pass
+
+    return q
+
+
+def _set_cursor_headers(resp, next_cursor, prev_cursor):
+    if next_cursor:
+        resp.headers["X-Next-Cursor"] = next_cursor
+    if prev_cursor:
+        resp.headers["X-Prev-Cursor"] = prev_cursor
+    return resp
+
+
 @telemetry_bp.get("/history")
 def history():
     """
@@ -41,9 +84,15 @@ def history():
 
     Query params:
       - robot_id: string (default "robot_1")
-      - limit: int (default 200)
+      - limit: int (default 200, at most MAX_PAGE_LIMIT)
       - since_ms: epoch milliseconds (optional)
       - until_ms: epoch milliseconds (optional)
+      - cursor: opaque token from a previous response (optional)
+
+    Pagination:
+      - Pages are keyset-based on (ts, id): without `cursor` the newest `limit` rows are
+        returned, then X-Next-Cursor (older page) / X-Prev-Cursor (newer page) headers
+        let the client walk the range at constant cost per page.
 
     Notes:
       - Timestamps are stored as naive UTC datetimes in the DB.
@@ -51,32 +100,82 @@ def history():
       - Response is returned in chronological order (oldest -> newest).
     """
     robot_id = request.args.get("robot_id", "robot_1")
-    limit = int(request.args.get("limit", "200"))
+    limit = min(request.args.get("limit", 200, type=int), MAX_PAGE_LIMIT)
+    cursor = request.args.get("cursor") or None
+
+    # Only the served columns, so the (robot_id, ts, id) covering index is enough.
+    q = (
+        db.session.query(RobotPosition)
+        .options(load_only(RobotPosition.robot_id, RobotPosition.ts, RobotPosition.lat,
+                           RobotPosition.lng, RobotPosition.topic))
+        .filter(RobotPosition.robot_id == robot_id)
+    )
+    q = _filter_window(q)
 
-    since_ms_raw = request.args.get("since_ms")
-    until_ms_raw = request.args.get("until_ms")
+    try:
+        rows_desc, next_cursor, prev_cursor = keyset_page(q, RobotPosition.ts, RobotPosition.id, cursor, limit)
+    except ValueError:
+        return jsonify({"error": "Invalid cursor"}), 400
 
-    q = db.session.query(RobotPosition).filter(RobotPosition.robot_id == robot_id)
+    # Pages come latest first, reverse to send chronological for plotting
+    rows = list(reversed(rows_desc))
 
-    # Optional time window filtering
-    if since_ms_raw is not None:
-        try:
-            since_ms = float(since_ms_raw)
-            since_dt = datetime.utcfromtimestamp(since_ms / 1000.0)
-            q = q.filter(RobotPosition.ts >= since_dt)
-        except Exception:
-            pass
+    resp = jsonify([r.to_dict() for r in rows])
+    return _set_cursor_headers(resp, next_cursor, prev_cursor), 200
 
-    if until_ms_raw is not None:
-        try:
-            until_ms = float(until_ms_raw)
-            until_dt = datetime.utcfromtimestamp(until_ms / 1000.0)
-            q = q.filter(RobotPosition.ts <= until_dt)
-        except Exception:
-            pass
 
-    # Query latest first, then reverse to send chronological for plotting
-    rows_desc = q.order_by(RobotPosition.ts.desc()).limit(limit).all()
-    rows = list(reversed(rows_desc))
+@telemetry_bp.get("/trajectory")
+def trajectory():
+    """
+    Return a history window projected into the RTAB-Map frame, as columns.
+
+    Same query params and pagination as /history (limit defaults to MAX_PAGE_LIMIT).
+    The whole page is projected in one NumPy pass (services/geo_projection.py):
+      - x, y: map frame meters
+      - px, py: pixel coordinates in /api/map/image (only if the default map is built)
+
+    Response (chronological):
+      { "robot_id", "ts": [...], "lat": [...], "lng": [...], "x": [...], "y": [...], "px": [...], "py": [...] }
+    """
+    anchor = geo_projection.get_geo_anchor(current_app.config)
+    if anchor is None:
+        return jsonify({"error": "GEO_ANCHOR_LAT/GEO_ANCHOR_LNG are not set"}), 404
 
-    return jsonify([r.to_dict() for r in rows]), 200
+    robot_id = request.args.get("robot_id", "robot_1")
+    limit = min(request.args.get("limit", MAX_PAGE_LIMIT, type=int), MAX_PAGE_LIMIT)
+    cursor = request.args.get("cursor") or None
+
+    q = (
+        db.session.query(RobotPosition)
+        .options(load_only(RobotPosition.ts, RobotPosition.lat, RobotPosition.lng))
+        .filter(RobotPosition.robot_id == robot_id)
+    )
+    q = _filter_window(q)
+
+    try:
+        rows_desc, next_cursor, prev_cursor = keyset_page(q, RobotPosition.ts, RobotPosition.id, cursor, limit)
+    except ValueError:
+        return jsonify({"error": "Invalid cursor"}), 400
+
+    rows = list(reversed(rows_desc))
+    lat = np.fromiter((r.lat for r in rows), dtype=np.float64, count=len(rows))
+    lng = np.fromiter((r.lng for r in rows), dtype=np.float64, count=len(rows))
+    x, y = anchor.to_map(lat, lng)
+
+    out = {
+        "robot_id": robot_id,
+        "ts": [r.ts.isoformat() for r in rows],
+        "lat": lat.tolist(),
+        "lng": lng.tolist(),
+        "x": np.round(x, 3).tolist(),
+        "y": np.round(y, 3).tolist(),
+    }
+
+    # Pixels only if the default map is already built, a telemetry request never triggers a map build.
+    built = map_registry.get_cached_map()
+    if built is not None:
+        px, py = geo_projection.map_to_pixels(x, y, built.info)
+        out["px"] = np.round(px, 1).tolist()
+        out["py"] = np.round(py, 1).tolist()
+
+    return _set_cursor_headers(jsonify(out), next_cursor, prev_cursor), 200
@@ -1,13 +1,14 @@
 from backend.app import create_app
 from backend.extensions import db, bcrypt
 from backend.models import User
+from backend.utils.schema import ensure_indexes, ensure_schema
 
 app = create_app()
 
 def seed_database():
     with app.app_context():
         print("Création des tables...")
-        db.create_all()
+        ensure_schema()
         if not User.query.filter_by(username='admin').first():
             print("Création de l'admin...")
             hashed_pw = bcrypt.generate_password_hash('vacop_admin_2026').decode('utf-8')
@@ -15,6 +16,7 @@ def seed_database():
             db.session.add(admin)
             db.session.commit()
             print("Admin créé.")
+        ensure_indexes()
 
 if __name__ == "__main__":
     seed_database()
\ No newline at end of file
@@ -0,0 +1,194 @@
+import os
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+from backend.services.map_service import compute_bounds_xy, iter_xyz_map
+from backend.utils.green import run_cpu_bound
+
+# Vertical slices recorded per cell as a 64-bit mask (bit k = a point in slice k)
+N_SLICES = 64
+SLICE_M = float(os.getenv("ELEVATION_SLICE_M", "0.1"))
+Z_BASE_M = float(os.getenv("ELEVATION_Z_BASE_M", "-1.0"))
+
+# min_z + max_z + count + bits
+BYTES_PER_CELL = 4 + 4 + 4 + 8
+
+
+class ElevationGrid:
+    """
+    Per-cell height statistics of a map, from which any height band is derived without re-reading scans.
+
+    - min_z, max_z: float32, +inf / -inf where no point fell
+    - count: uint32 number of points per cell
+    - bits: uint64 mask of occupied vertical slices [Z_BASE_M + k*SLICE_M, Z_BASE_M + (k+1)*SLICE_M)
+    All arrays are (H, W) with row 0 at y = origin_y, like build_occupancy_grid.
+    """
+
+    def __init__(self, min_z, max_z, count, bits, origin_x: float, origin_y: float, resolution: float,
+                 z_base: float = Z_BASE_M, slice_m: float = SLICE_M):
+        self.min_z = min_z
+        self.max_z = max_z
+        self.count = count
+        self.bits = bits
+        self.origin_x = origin_x
+        self.origin_y = origin_y
+        self.resolution = resolution
+        self.z_base = z_base
+        self.slice_m = slice_m
+
+    @property
+    def observed(self) -> np.ndarray:
+        return self.count > 0
+
+    def band_mask(self, z_min: float, z_max: float) -> np.uint64:
+        """Slice bits covering [z_min, z_max] (clamped to the recorded slices)."""
+        k0 = int(np.floor((z_min - self.z_base) / self.slice_m))
+        k1 = int(np.floor((z_max - self.z_base) / self.slice_m))
+        k0, k1 = max(k0, 0), min(k1, N_SLICES - 1)
+        if k0 > k1:
+            return np.uint64(0)
+        n = k1 - k0 + 1
+        ones = np.uint64(0xFFFFFFFFFFFFFFFF) if n == N_SLICES else np.uint64((1 << n) - 1)
+        return np.uint64(ones << np.uint64(k0))
+
+    def occupancy(self, z_min: float, z_max: float) -> np.ndarray:
+        """uint8 grid, 1 where a point lies in the height band (slice precision)."""
+        return ((self.bits & self.band_mask(z_min, z_max)) != 0).astype(np.uint8)
+
+    def step_map(self) -> np.ndarray:
+        """Largest ground height difference (min_z) with the 4 neighbors, 0 where unknown."""
+        ground = np.where(self.observed, self.min_z, np.nan).astype(np.float32)
+        step = np.zeros_like(ground)
+        for a, b in ((np.s_[1:, :], np.s_[:-1, :]), (np.s_[:, 1:], np.s_[:, :-1])):
+            d = np.abs(ground[a] - ground[b])  # NaN when a neighbor is unknown
+            step[a] = np.fmax(step[a], d)
+            step[b] = np.fmax(step[b], d)
+        return step
+
+    def traversable(self, max_step: float, body_z_min: float, body_z_max: float) -> np.ndarray:
+        """Observed cells whose ground steps are <= max_step and with nothing in the body height band."""
+        return self.observed & (self.step_map() <= max_step) & (self.occupancy(body_z_min, body_z_max) == 0)
+
+    @property
+    def nbytes(self) -> int:
+        return self.min_z.nbytes + self.max_z.nbytes + self.count.nbytes + self.bits.nbytes
+
+
+def build_elevation_grid(
+    db_path: str,
+    resolution: float,
+    stride: int = 1,
+    max_points_per_scan: int | None = 20000,
+    padding_m: float = 1.0,
+    max_cells: int = 150_000_000,
+) -> ElevationGrid:
+    """
+    Compute min Z, max Z, hit count and slice mask of every cell in a single pass over the scans.
+
+    Each scan is sorted by cell index once; np.minimum/maximum/bitwise_or.reduceat then reduce
+    all points of a cell together and the results are merged into the grid with plain
+    (duplicate-free) fancy indexing.
+    """
+    min_x, min_y, max_x, max_y, _ = compute_bounds_xy(db_path, None, stride, max_points_per_scan, None)
+    min_x -= padding_m
+    min_y -= padding_m
+    max_x += padding_m
+    max_y += padding_m
+
+    width = int(np.ceil((max_x - min_x) / resolution)) + 1
+    height = int(np.ceil((max_y - min_y) / resolution)) + 1
+    cells = width * height
+    if cells > max_cells:
+        raise RuntimeError(f"Grid too big: {width}x{height} = {cells:,} cells (max {max_cells:,}).")
+
+    min_z = np.full(cells, np.inf, dtype=np.float32)
+    max_z = np.full(cells, -np.inf, dtype=np.float32)
+    count = np.zeros(cells, dtype=np.uint32)
+    bits = np.zeros(cells, dtype=np.uint64)
+
+    for xyz in iter_xyz_map(db_path, None, stride, max_points_per_scan, None):
+        ix = np.floor((xyz[:, 0] - min_x) / resolution).astype(np.int64)
+        iy = np.floor((xyz[:, 1] - min_y) / resolution).astype(np.int64)
+        m = (ix >= 0) & (ix < width) & (iy >= 0) & (iy < height)
+        if not m.any():
+            continue
+        flat = iy[m] * width + ix[m]
+        z = xyz[m, 2]
+
+        order = np.argsort(flat, kind="stable")
+        flat = flat[order]
+        z = z[order]
+        starts = np.flatnonzero(np.r_[True, flat[1:] != flat[:-1]])
+        u = flat[starts]
+
+        k = np.floor((z - Z_BASE_M) / SLICE_M)
+        in_range = (k >= 0) & (k < N_SLICES)
+        slice_bits = np.where(in_range, np.left_shift(np.uint64(1), np.clip(k, 0, N_SLICES - 1).astype(np.uint64)), np.uint64(0))
+
+        min_z[u] = np.minimum(min_z[u], np.minimum.reduceat(z, starts))
+        max_z[u] = np.maximum(max_z[u], np.maximum.reduceat(z, starts))
+        count[u] += np.diff(np.r_[starts, flat.size]).astype(np.uint32)
+        bits[u] |= np.bitwise_or.reduceat(slice_bits, starts)
+
+    shape = (height, width)
+    return ElevationGrid(min_z.reshape(shape), max_z.reshape(shape), count.reshape(shape), bits.reshape(shape),
+                         min_x, min_y, resolution)
+
+
+_LOCK = threading.Lock()
+_CACHE = OrderedDict()  # (db_path, mtime_ns, resolution, stride) -> ElevationGrid, least recently used first
+_CACHE_BYTES = 0
+_BUILD_LOCKS = {}
+
+
+def _budget_bytes() -> int:
+    # same budget as the occupancy maps (map_registry.py), accounted separately
+    return int(float(os.environ.get("MAP_CACHE_MB", "512")) * 1024 * 1024)
+
+
+def _insert(key, grid: ElevationGrid) -> None:
+    """Add a grid, drop stale versions of the same (db, params) and evict LRU entries over budget."""
+    global _CACHE_BYTES
+    with _LOCK:
+        for old_key in [k for k in _CACHE if k[0] == key[0] and k[2:] == key[2:] and k[1] != key[1]]:
+            _CACHE_BYTES -= _CACHE.pop(old_key).nbytes
+        _CACHE[key] = grid
+        _CACHE_BYTES += grid.nbytes
+        # always keep the grid that was just built
+        while _CACHE_BYTES > _budget_bytes() and len(_CACHE) > 1:
+            _, old = _CACHE.popitem(last=False)
+            _CACHE_BYTES -= old.nbytes
+
+
+def get_elevation_grid(db_path: str, resolution: float, stride: int = 1) -> ElevationGrid:
+    """
+    Elevation grid of a DB, built once per (db, mtime, resolution, stride) and kept in an LRU under MAP_CACHE_MB.
+
+    Concurrent requests for the same grid wait for a single build, which runs in a native
+    thread (utils/green.py) so the eventlet hub keeps serving. Grids larger than the budget
+    are refused (RuntimeError) before anything is allocated.
+    """
+    key = (db_path, os.stat(db_path).st_mtime_ns, resolution, stride)
+    with _LOCK:
+        grid = _CACHE.get(key)
+        if grid is not None:
+            _CACHE.move_to_end(key)
+            return grid
+        build_lock = _BUILD_LOCKS.setdefault(key, threading.Lock())
+
+    try:
+        with build_lock:
+            with _LOCK:
+                grid = _CACHE.get(key)
+            if grid is None:
+                max_cells = _budget_bytes() // BYTES_PER_CELL
+                grid = run_cpu_bound(build_elevation_grid, db_path, resolution, stride, max_cells=max_cells)
+                _insert(key, grid)
+                print(f"[ELEV] built {grid.count.shape[1]}x{grid.count.shape[0]} res={resolution} "
+                      f"({grid.nbytes / 1e6:.1f} MB)")
+    finally:
+        with _LOCK:
+            _BUILD_LOCKS.pop(key, None)
+    return grid
@@ -0,0 +1,109 @@
+import math
+import threading
+
+import numpy as np
+
+# WGS84 ellipsoid
+_WGS84_A = 6378137.0
+_WGS84_F = 1.0 / 298.257223563
+_WGS84_E2 = _WGS84_F * (2.0 - _WGS84_F)
+
+
+def _geodetic_to_ecef(lat_deg, lng_deg, alt_m):
+    lat = np.radians(lat_deg)
+    lng = np.radians(lng_deg)
+    sin_lat = np.sin(lat)
+    cos_lat = np.cos(lat)
+    n = _WGS84_A / np.sqrt(1.0 - _WGS84_E2 * sin_lat * sin_lat)
+    x = (n + alt_m) * cos_lat * np.cos(lng)
+    y = (n + alt_m) * cos_lat * np.sin(lng)
+    z = (n * (1.0 - _WGS84_E2) + alt_m) * sin_lat
+    return x, y, z
+
+
+class GeoAnchor:
+    """
+    Link between GNSS (WGS84 lat/lng) and the RTAB-Map frame.
+
+    The anchor is a GNSS position whose map frame coordinates are known (x0, y0),
+    plus the rotation of the map x axis relative to East (yaw, counter-clockwise).
+    Points go geodetic -> ECEF -> local ENU at the anchor -> rotated map frame,
+    all as whole-array NumPy operations.
+    """
+
+    def __init__(self, lat: float, lng: float, alt: float = 0.0, x0: float = 0.0, y0: float = 0.0, yaw_deg: float = 0.0):
+        self.lat = lat
+        self.lng = lng
+        self.alt = alt
+        self.x0 = x0
+        self.y0 = y0
+        self.yaw_deg = yaw_deg
+
+        self._origin = np.array(_geodetic_to_ecef(lat, lng, alt), dtype=np.float64)
+
+        lat_r = math.radians(lat)
+        lng_r = math.radians(lng)
+        # ECEF delta -> ENU (rows: east, north)
+        ecef_to_en = np.array([
+            [-math.sin(lng_r), math.cos(lng_r), 0.0],
+            [-math.sin(lat_r) * math.cos(lng_r), -math.sin(lat_r) * math.sin(lng_r), math.cos(lat_r)],
+        ])
+        yaw = math.radians(yaw_deg)
+        # ENU -> map frame (map x axis is `yaw` CCW from East)
+        en_to_map = np.array([
+            [math.cos(yaw), math.sin(yaw)],
+            [-math.sin(yaw), math.cos(yaw)],
+        ])
+        self._ecef_to_map = en_to_map @ ecef_to_en  # (2, 3)
+
+    def to_map(self, lat, lng):
+        """Project lat/lng (degrees, scalars or arrays) to map frame meters. Returns (x, y) float64 arrays."""
+        lat = np.asarray(lat, dtype=np.float64)
+        lng = np.asarray(lng, dtype=np.float64)
+        ecef = np.stack(_geodetic_to_ecef(lat, lng, self.alt), axis=-1)  # (..., 3)
+        xy = (ecef - self._origin) @ self._ecef_to_map.T  # (..., 2)
+        return xy[..., 0] + self.x0, xy[..., 1] + self.y0
+
+    def to_dict(self):
+        return {
+            "lat": self.lat,
+            "lng": self.lng,
+            "alt": self.alt,
+            "x0": self.x0,
+            "y0": self.y0,
+            "yaw_deg": self.yaw_deg,
+        }
+
+
+def map_to_pixels(x, y, info: dict):
+    """
+    Map frame meters -> pixel coordinates of the occupancy PNG (row 0 at the top, y = max_y),
+    same convention as MapComponent.tsx.
+    """
+    px = (np.asarray(x) - info["origin_x"]) / info["resolution"]
+    py = info["height"] - (np.asarray(y) - info["origin_y"]) / info["resolution"]
+    return px, py
+
+
+_LOCK = threading.Lock()
+_ANCHOR = None
+_ANCHOR_KEY = None
+
+
+def get_geo_anchor(config):
+    """
+    Build (once) the anchor from the Flask config, or None if GEO_ANCHOR_LAT/LNG are not set.
+    """
+    global _ANCHOR, _ANCHOR_KEY
+    lat = config.get("GEO_ANCHOR_LAT")
+    lng = config.get("GEO_ANCHOR_LNG")
+    if lat is None or lng is None:
+        return None
+
+    key = (lat, lng, config.get("GEO_ANCHOR_ALT", 0.0), config.get("GEO_ANCHOR_X", 0.0),
+           config.get("GEO_ANCHOR_Y", 0.0), config.get("GEO_ANCHOR_YAW_DEG", 0.0))
+    with _LOCK:
+        if _ANCHOR_KEY != key:
+            _ANCHOR = GeoAnchor(*key)
+            _ANCHOR_KEY = key
+        return _ANCHOR
@@ -0,0 +1,251 @@
+import math
+import os
+import threading
+import time
+from collections import defaultdict
+
+import numpy as np
+
+from backend.models import Zone
+from backend.services.shared_state import get_redis
+
+ZONE_KINDS = ("operating_area", "restricted")
+
+# Grid cell size of the spatial index (degrees, ~110 m in latitude for 0.001)
+_CELL_DEG = float(os.getenv("GEOFENCE_CELL_DEG", "0.001"))
+# Zones spanning more cells than this are checked on every fix instead of being indexed
+_MAX_CELLS_PER_ZONE = 10_000
+
+# Bumped on every zone change so all workers rebuild their index (multi-worker mode)
+_VERSION_KEY = "vacop:geofence:version"
+_VERSION_POLL_S = 5.0
+# Zones containing the previous fix of each robot, shared by the workers: with MQTT_INGEST_MODE=shared
+# consecutive fixes of a robot land on different workers
+_INSIDE_KEY = "vacop:geofence:inside:{}"
+_INSIDE_TTL_S = 24 * 3600
+
+
+def validate_polygon(polygon) -> list[list[float]]:
+    """Return the polygon as [[lat, lng], ...] floats, raise ValueError if it is not a valid ring."""
+    if not isinstance(polygon, list) or len(polygon) < 3:
+        raise ValueError("polygon must be a list of at least 3 [lat, lng] points")
+    points = []
+    for p in polygon:
+        if not isinstance(p, (list, tuple)) or len(p) != 2:
+            raise ValueError("polygon points must be [lat, lng]")
+        try:
+            lat, lng = float(p[0]), float(p[1])
+        except (TypeError, ValueError):
+            raise ValueError("polygon points must be numeric [lat, lng]")
+        if not (-90.0 <= lat <= 90.0 and -180.0 <= lng <= 180.0):
+            raise ValueError("polygon point out of WGS84 range")
+        points.append([lat, lng])
+    return points
+
+
+class _Polygon:
+    """Zone geometry with edge arrays precomputed for the point-in-polygon test."""
+
+    def __init__(self, zone_id: int, name: str, kind: str, robot_id, polygon):
+        self.id = zone_id
+        self.name = name
+        self.kind = kind
+        self.robot_id = robot_id
+
+        pts = np.asarray(polygon, dtype=np.float64)
+        self.lat_i = pts[:, 0]
+        self.lng_i = pts[:, 1]
+        self.lat_j = np.roll(self.lat_i, 1)
+        self.lng_j = np.roll(self.lng_i, 1)
+        self.bbox = (pts[:, 0].min(), pts[:, 1].min(), pts[:, 0].max(), pts[:, 1].max())
+
+    def contains(self, lat: float, lng: float) -> bool:
+        """Even-odd ray casting over all edges at once (planar lat/lng, fine at site scale)."""
+        min_lat, min_lng, max_lat, max_lng = self.bbox
+        if not (min_lat <= lat <= max_lat and min_lng <= lng <= max_lng):
+            return False
+        crosses = (self.lat_i > lat) != (self.lat_j > lat)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            lng_cross = (self.lng_j - self.lng_i) * (lat - self.lat_i) / (self.lat_j - self.lat_i) + self.lng_i
+        return bool(np.count_nonzero(crosses & (lng < lng_cross)) % 2)
+
+
+class GeofenceIndex:
+    """
+    Uniform grid over lat/lng: each cell lists the zones whose bounding box touches it.
+
+    A fix only runs the exact polygon test on the zones of its cell, so the cost per fix
+    does not grow with the number of zones.
+    """
+
+    def __init__(self, zones: list[_Polygon], cell_deg: float = _CELL_DEG):
+        self.cell_deg = cell_deg
+        self.zones = {z.id: z for z in zones}
+        self.cells = defaultdict(list)
+        self.unindexed = []
+
+        for z in zones:
+            min_lat, min_lng, max_lat, max_lng = z.bbox
+            i0, j0 = self._cell(min_lat, min_lng)
+            i1, j1 = self._cell(max_lat, max_lng)
+            if (i1 - i0 + 1) * (j1 - j0 + 1) > _MAX_CELLS_PER_ZONE:
+                self.unindexed.append(z)
+                continue
+            for i in range(i0, i1 + 1):
+                for j in range(j0, j1 + 1):
+                    self.cells[(i, j)].append(z)
+
+    def _cell(self, lat: float, lng: float):
+        return math.floor(lat / self.cell_deg), math.floor(lng / self.cell_deg)
+
+    def zones_at(self, robot_id: str, lat: float, lng: float) -> frozenset:
+        """Ids of the zones (for this robot) containing the point."""
+        candidates = self.cells.get(self._cell(lat, lng), [])
+        if self.unindexed:
+            candidates = candidates + self.unindexed
+        return frozenset(
+            z.id for z in candidates
+            if (z.robot_id is None or z.robot_id == robot_id) and z.contains(lat, lng)
+        )
+
+
+_LOCK = threading.Lock()
+_INDEX = None
+_DIRTY = True
+_VERSION = None
+_LAST_POLL = 0.0
+_INSIDE = {}  # robot_id -> frozenset of zone ids at the previous fix
+
+
+def invalidate_zones() -> None:
+    """Mark the index stale after a zone change (here and, through Redis, on the other workers)."""
+    global _DIRTY
+    with _LOCK:
+        _DIRTY = True
+    r = get_redis()
+    if r is not None:
+        try:
+            r.incr(_VERSION_KEY)
+        except Exception as exc:
+            # the zone is already committed; other workers see it after the next shared change
+            print("[GEOFENCE] Failed to share zone change:", exc)
+
+
+def _index_is_stale() -> bool:
+    global _LAST_POLL
+    if _DIRTY or _INDEX is None:
+        return True
+    r = get_redis()
+    now = time.monotonic()
+    if r is None or now - _LAST_POLL < _VERSION_POLL_S:
+        return False
+    _LAST_POLL = now
+    try:
+        version = r.get(_VERSION_KEY)
+    except Exception:
+        return False
+    return version != _VERSION
+
+
+def _rebuild(app) -> None:
+    global _INDEX, _DIRTY, _VERSION
+    with _LOCK:
+        # cleared first: a zone change during the rebuild marks the index stale again
+        _DIRTY = False
+    r = get_redis()
+    try:
+        version = r.get(_VERSION_KEY) if r is not None else None
+    except Exception:
+        version = None
+    with app.app_context():
+        zones = [
+            _Polygon(z.id, z.name, z.kind, z.robot_id, z.polygon)
+            for z in Zone.query.filter_by(active=True).all()
+        ]
+    with _LOCK:
+        _INDEX = GeofenceIndex(zones)
+        _VERSION = version
+        # forget zones that no longer exist
+        for robot_id, inside in _INSIDE.items():
+            _INSIDE[robot_id] = frozenset(i for i in inside if i in _INDEX.zones)
+    print(f"[GEOFENCE] index rebuilt: {len(zones)} zones, {len(_INDEX.cells)} cells")
+
+
+def check_position(app, robot_id: str, lat: float, lng: float) -> list[dict]:
+    """
+    Compare the zones containing this fix with the previous fix of the robot.
+
+    Returns enter/exit events. On the first fix of a robot only restricted zones
+    already entered are reported (its previous position is unknown).
+    """
+    if _index_is_stale():
+        _rebuild(app)
+
+    index = _INDEX
+    current = index.zones_at(robot_id, lat, lng)
+    previous = _swap_inside(robot_id, current)
+    if previous is not None:
+        # ids of zones deleted since the previous fix
+        previous = frozenset(i for i in previous if i in index.zones)
+
+    if previous is None:
+        entered = {i for i in current if index.zones[i].kind == "restricted"}
+        exited = set()
+    else:
+        entered = current - previous
+        exited = previous - current
+
+    events = []
+    for event, ids in (("enter", entered), ("exit", exited)):
+        for zone_id in sorted(ids):
+            zone = index.zones.get(zone_id)
+            if zone is None:
+                continue
+            events.append({
+                "robot_id": robot_id,
+                "event": event,
+                "zone_id": zone.id,
+                "zone_name": zone.name,
+                "kind": zone.kind,
+                "lat": lat,
+                "lng": lng,
+                "level": _event_level(zone.kind, event),
+            })
+    return events
+
+
+def _swap_inside(robot_id: str, current: frozenset):
+    """
+    Store the zones of this fix and return those of the previous fix (None for the first fix).
+
+    With Redis the swap is one atomic SET ... GET, so each transition is reported by exactly one
+    worker; the per-process dict is used without Redis or when it is unreachable.
+    """
+    r = get_redis()
+    if r is not None:
+        try:
+            old = r.set(_INSIDE_KEY.format(robot_id), ",".join(map(str, sorted(current))),
+                        ex=_INSIDE_TTL_S, get=True)
+            if old is None:
+                return None
+            return frozenset(int(i) for i in old.split(",") if i)
+        except Exception as exc:
+            print("[GEOFENCE] Failed to share zone state, using the local one:", exc)
+    with _LOCK:
+        previous = _INSIDE.get(robot_id)
+        _INSIDE[robot_id] = current
+    return previous
+
+
+def _event_level(kind: str, event: str) -> str:
+    if kind == "restricted" and event == "enter":
+        return "ERROR"
+    if kind == "operating_area" and event == "exit":
+        return "WARNING"
+    return "INFO"
+
+
+def event_message(ev: dict) -> str:
+    verb = "entered" if ev["event"] == "enter" else "left"
+    label = "operating area" if ev["kind"] == "operating_area" else "restricted zone"
+    return f"{ev['robot_id']} {verb} {label} '{ev['zone_name']}' at ({ev['lat']:.6f}, {ev['lng']:.6f})"
@@ -0,0 +1,159 @@
+import hashlib
+import json
+import os
+import tempfile
+
+import numpy as np
+
+from backend.services.map_service import PackedGrid
+
+# Bump when the on-disk layout changes, older artifacts are then ignored and rebuilt.
+ARTIFACT_VERSION = 1
+
+
+def artifact_dir() -> str:
+    """
+    Directory of persisted maps: MAP_ARTIFACT_DIR, or instance/map_cache next to the package
+    (the Flask instance folder, mounted as a volume in Docker).
+    """
+    env_dir = os.environ.get("MAP_ARTIFACT_DIR")
+    if env_dir:
+        return env_dir
+    return os.path.abspath(os.path.join(os.path.dirname(__file__), "../../instance/map_cache"))
+
+
+def _max_per_db() -> int:
+    """Artifacts kept per source DB (MAP_ARTIFACTS_PER_DB), the least recently used are deleted."""
+    return max(1, int(os.environ.get("MAP_ARTIFACTS_PER_DB", "8")))
+
+
+def _params_to_json(params) -> dict:
+    d = params._asdict()
+    if d["z_range"] is not None:
+        d["z_range"] = [z if np.isfinite(z) else None for z in d["z_range"]]
+    return d
+
+
+def _stem(db_path: str, params) -> str:
+    """One artifact per (source DB, build params); the DB version is checked from the metadata."""
+    key = json.dumps({"db": os.path.abspath(db_path), "params": _params_to_json(params)}, sort_keys=True)
+    return hashlib.sha1(key.encode("utf-8")).hexdigest()[:16]
+
+
+def atomic_write(path: str, write):
+    """Write through a temporary file in the same directory, then rename over `path`."""
+    fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path), prefix=".tmp-")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            write(f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, path)
+    except BaseException:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+        raise
+
+
+def save_artifact(built) -> None:
+    """
+    Persist a BuiltMap as <stem>.npy (bit-packed grid), <stem>.png and <stem>.json (metadata).
+
+    The JSON is written last: a crash half-way leaves no metadata pointing to partial files.
+    """
+    out_dir = artifact_dir()
+    os.makedirs(out_dir, exist_ok=True)
+    stem = os.path.join(out_dir, _stem(built.db_path, built.params))
+
+    packed = built.grid.packed
+    atomic_write(stem + ".npy", lambda f: np.save(f, packed, allow_pickle=False))
+    atomic_write(stem + ".png", lambda f: f.write(built.png))
+
+    st = os.stat(built.db_path)
+    meta = {
+        "version": ARTIFACT_VERSION,
+        "db_path": os.path.abspath(built.db_path),
+        "db_mtime_ns": st.st_mtime_ns,
+        "db_size": st.st_size,
+        "params": _params_to_json(built.params),
+        "origin_x": built.info["origin_x"],
+        "origin_y": built.info["origin_y"],
+        "resolution": built.info["resolution"],
+        "width": built.info["width"],
+        "height": built.info["height"],
+    }
+    atomic_write(stem + ".json", lambda f: f.write(json.dumps(meta, indent=2).encode("utf-8")))
+    prune_artifacts(built.db_path)
+
+
+def prune_artifacts(db_path: str) -> None:
+    """
+    Keep the MAP_ARTIFACTS_PER_DB most recently used artifacts of `db_path`, delete the others.
+
+    Recency is the JSON mtime (written on save, touched on load). The JSON goes first, so
+    no metadata ever points to deleted files; a worker still mapping a deleted .npy keeps it.
+    """
+    out_dir = artifact_dir()
+    db_abs = os.path.abspath(db_path)
+    entries = []
+    for fname in os.listdir(out_dir):
+        if not fname.endswith(".json"):
+            continue
+        path = os.path.join(out_dir, fname)
+        try:
+            with open(path, "rb") as f:
+                meta = json.load(f)
+            used = os.stat(path).st_mtime_ns
+        except (OSError, ValueError):
+            continue
+        if isinstance(meta, dict) and meta.get("db_path") == db_abs:
+            entries.append((used, path[:-len(".json")]))
+
+    entries.sort(reverse=True)
+    for _, stem in entries[_max_per_db():]:
+        for ext in (".json", ".npy", ".png"):
+            try:
+                os.remove(stem + ext)
+            except FileNotFoundError:
+                pass
+        print(f"[MAP] pruned artifact {os.path.basename(stem)}")
+
+
+def load_artifact(db_path: str, params):
+    """
+    Load a persisted map if it matches the current source DB (path, mtime, size) and params.
+
+    Returns (PackedGrid, origin_x, origin_y, png bytes) or None when missing or stale.
+    The grid wraps the memory-mapped .npy as is: pages are read on access, nothing is unpacked.
+    """
+    stem = os.path.join(artifact_dir(), _stem(db_path, params))
+    try:
+        with open(stem + ".json", "rb") as f:
+            meta = json.load(f)
+        st = os.stat(db_path)
+        if (
+            meta.get("version") != ARTIFACT_VERSION
+            or meta.get("db_path") != os.path.abspath(db_path)
+            or meta.get("db_mtime_ns") != st.st_mtime_ns
+            or meta.get("db_size") != st.st_size
+            or meta.get("params") != _params_to_json(params)
+        ):
+            return None
+
+        packed = np.load(stem + ".npy", mmap_mode="r", allow_pickle=False)
+        height, width = meta["height"], meta["width"]
+        if packed.shape != (height, (width + 7) // 8):
+            return None
+        grid = PackedGrid(packed, width)
+
+        with open(stem + ".png", "rb") as f:
+            png = f.read()
+    except (OSError, ValueError, KeyError):
+        return None
+
+    try:
+        os.utime(stem + ".json")  # recency for prune_artifacts
+    except OSError:
+        pass
+
+    return grid, meta["origin_x"], meta["origin_y"], png
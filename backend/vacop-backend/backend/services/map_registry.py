@@ -0,0 +1,278 @@
+import io
+import math
+import os
+import threading
+from collections import OrderedDict
+from typing import NamedTuple
+
+from backend.services.map_service import build_occupancy_grid, save_grid_png
+from backend.services.map_artifact import load_artifact, save_artifact
+from backend.utils.green import run_cpu_bound
+
+DEFAULT_MAP = "default"
+
+
+class MapParams(NamedTuple):
+    """Build parameters of an occupancy grid (hashable, part of the cache key)."""
+    resolution: float = 0.05
+    z_range: tuple[float, float] | None = None
+    stride: int = 1
+    max_points_per_scan: int | None = 20000
+    padding_m: float = 1.0
+
+
+DEFAULT_PARAMS = MapParams()
+
+# Every distinct set of params is a full build (and an artifact on disk): query strings may only
+# pick a listed resolution / stride, z bounds are snapped to Z_STEP_M within +-Z_LIMIT_M.
+RESOLUTIONS = (0.02, 0.05, 0.1, 0.2, 0.5, 1.0)
+STRIDES = (1, 2, 5, 10, 20, 50, 100)
+Z_STEP_M = 0.1
+Z_LIMIT_M = 50.0
+
+
+class BuiltMap:
+    """A generated map: occupancy grid, metadata and encoded PNG."""
+
+    def __init__(self, name: str, db_path: str, mtime_ns: int, params: MapParams, grid, origin_x: float, origin_y: float,
+                 png: bytes | None = None):
+        self.name = name
+        self.db_path = db_path
+        self.mtime_ns = mtime_ns
+        self.params = params
+        self.grid = grid
+
+        # grid.shape is (height, width)
+        height, width = grid.shape
+        self.info = {
+            "map": name,
+            "origin_x": origin_x,
+            "origin_y": origin_y,
+            "resolution": params.resolution,
+            "width": width,
+            "height": height,
+            "z_range": [z if math.isfinite(z) else None for z in params.z_range] if params.z_range else None,
+            "stride": params.stride,
+        }
+
+        if png is None:
+            buf = io.BytesIO()
+            save_grid_png(grid, buf)
+            png = buf.getvalue()
+        self.png = png
+
+    @property
+    def nbytes(self) -> int:
+        return self.grid.nbytes + len(self.png)
+
+
+def _default_db_path():
+    # Priority: Env var > Relative path
+    env_path = os.environ.get('DB_PATH')
+    if env_path:
+        return env_path
+
+    # Fallback to relative path detection (Local dev)
+    # map_registry.py is in backend/services/
+    # We want ../../../instance/rtabmap...
+    return os.path.abspath(os.path.join(os.path.dirname(__file__), '../../../instance/rtabmap_26_02_1.db'))
+
+
+def list_maps() -> dict:
+    """
+    Known RTAB-Map databases, name -> sqlite path.
+
+    MAP_DBS="site_a=/data/a.db,site_b=/data/b.db" adds maps next to `default` (DB_PATH).
+    """
+    maps = {DEFAULT_MAP: _default_db_path()}
+    for item in os.environ.get("MAP_DBS", "").split(","):
+        name, sep, path = item.partition("=")
+        if sep and name.strip() and path.strip():
+            maps[name.strip()] = path.strip()
+    return maps
+
+
+def _parse_z(value, unbounded: float) -> float:
+    if value is None:
+        return unbounded
+    z = float(value)
+    if not (math.isfinite(z) and abs(z) <= Z_LIMIT_M):
+        raise ValueError(f"z_min/z_max must be within [-{Z_LIMIT_M}, {Z_LIMIT_M}] m")
+    return round(round(z / Z_STEP_M) * Z_STEP_M, 6)
+
+
+def parse_params(args) -> MapParams:
+    """
+    Read build parameters from query args (resolution, z_min/z_max, stride).
+    Raises ValueError on invalid values.
+    """
+    resolution = float(args.get("resolution", DEFAULT_PARAMS.resolution))
+    stride = int(args.get("stride", DEFAULT_PARAMS.stride))
+    z_min = args.get("z_min")
+    z_max = args.get("z_max")
+
+    resolution = next((r for r in RESOLUTIONS if math.isclose(resolution, r)), None)
+    if resolution is None:
+        raise ValueError(f"resolution must be one of {list(RESOLUTIONS)} m")
+    if stride not in STRIDES:
+        raise ValueError(f"stride must be one of {list(STRIDES)}")
+
+    z_range = None
+    if z_min is not None or z_max is not None:
+        z_range = (_parse_z(z_min, float("-inf")), _parse_z(z_max, float("inf")))
+        if z_range[0] >= z_range[1]:
+            raise ValueError("z_min must be lower than z_max")
+
+    return DEFAULT_PARAMS._replace(resolution=resolution, z_range=z_range, stride=stride)
+
+
+_LOCK = threading.Lock()
+_CACHE = OrderedDict()  # (db_path, mtime_ns, params) -> BuiltMap, least recently used first
+_CACHE_BYTES = 0
+_BUILD_LOCKS = {}
+
+
+def _budget_bytes() -> int:
+    return int(float(os.environ.get("MAP_CACHE_MB", "512")) * 1024 * 1024)
+
+
+def _insert(key, built: BuiltMap):
+    """Add a map, drop stale versions of the same (db, params) and evict LRU entries over budget."""
+    global _CACHE_BYTES
+    with _LOCK:
+        for old_key in [k for k in _CACHE if k[0] == key[0] and k[2] == key[2] and k[1] != key[1]]:
+            _CACHE_BYTES -= _CACHE.pop(old_key).nbytes
+
+        _CACHE[key] = built
+        _CACHE_BYTES += built.nbytes
+
+        budget = _budget_bytes()
+        # always keep the map that was just built, even if it alone exceeds the budget
+        while _CACHE_BYTES > budget and len(_CACHE) > 1:
+            old_key, old = _CACHE.popitem(last=False)
+            _CACHE_BYTES -= old.nbytes
+            print(f"[MAP] evicted {old.name} res={old.params.resolution} ({old.nbytes / 1e6:.1f} MB)")
+
+
+def _cache_key(name: str, params: MapParams):
+    db_path = list_maps().get(name)
+    if db_path is None or not os.path.exists(db_path):
+        return None
+    return (db_path, os.stat(db_path).st_mtime_ns, params)
+
+
+def _load_persisted(name: str, key):
+    """Load the persisted artifact of `key` into the cache, or None if missing/stale."""
+    db_path, mtime_ns, params = key
+    loaded = load_artifact(db_path, params)
+    if loaded is None:
+        return None
+    grid, origin_x, origin_y, png = loaded
+    built = BuiltMap(name, db_path, mtime_ns, params, grid, origin_x, origin_y, png=png)
+    _insert(key, built)
+    print(f"Map loaded from artifact: {name} {built.info['width']}x{built.info['height']}")
+    return built
+
+
+def get_cached_map(name: str = DEFAULT_MAP, params: MapParams = DEFAULT_PARAMS):
+    """Return the map if it is already built, never builds."""
+    key = _cache_key(name, params)
+    if key is None:
+        return None
+    with _LOCK:
+        built = _CACHE.get(key)
+        if built is not None:
+            _CACHE.move_to_end(key)
+        return built
+
+
+def get_persisted_map(name: str = DEFAULT_MAP, params: MapParams = DEFAULT_PARAMS):
+    """
+    Return the map from the cache or its persisted artifact, never builds and never waits for a build
+    (startup prewarm, goal validation): None while the map is being built.
+    """
+    key = _cache_key(name, params)
+    if key is None:
+        return None
+    built = get_cached_map(name, params)
+    if built is not None:
+        return built
+    with _LOCK:
+        build_lock = _BUILD_LOCKS.setdefault(key, threading.Lock())
+    if not build_lock.acquire(blocking=False):
+        return None
+    try:
+        return get_cached_map(name, params) or _load_persisted(name, key)
+    finally:
+        build_lock.release()
+        with _LOCK:
+            _BUILD_LOCKS.pop(key, None)
+
+
+def _build_map(name: str, db_path: str, mtime_ns: int, params: MapParams) -> BuiltMap:
+    grid, min_x, min_y, _ = build_occupancy_grid(
+        db_path=db_path,
+        resolution=params.resolution,
+        limit_nodes=None,
+        stride=params.stride,
+        max_points_per_scan=params.max_points_per_scan,
+        z_range=params.z_range,
+        padding_m=params.padding_m,
+    )
+    return BuiltMap(name, db_path, mtime_ns, params, grid, min_x, min_y)
+
+
+def get_map(name: str = DEFAULT_MAP, params: MapParams = DEFAULT_PARAMS):
+    """
+    Return the built map for (name, params), building it on first use.
+
+    Entries are keyed by (db path, db mtime, params): a modified RTAB-Map DB is rebuilt,
+    and switching maps or resolutions is a dict lookup once built.
+    Built maps are persisted (services/map_artifact.py), so after a restart they are
+    loaded from disk instead of rebuilt as long as the source DB is unchanged.
+    Returns None if the map is unknown or its DB is missing; build errors are raised.
+    """
+    key = _cache_key(name, params)
+    if key is None:
+        print(f"Advert: DB not found for map '{name}'")
+        return None
+
+    built = get_cached_map(name, params)
+    if built is not None:
+        return built
+
+    # one build per key, concurrent requests for the same map wait for it
+    with _LOCK:
+        build_lock = _BUILD_LOCKS.setdefault(key, threading.Lock())
+    try:
+        with build_lock:
+            db_path, mtime_ns, _ = key
+            built = get_cached_map(name, params) or _load_persisted(name, key)
+            if built is None:
+                # grid + PNG encoding in a native thread, the eventlet hub keeps serving meanwhile
+                built = run_cpu_bound(_build_map, name, db_path, mtime_ns, params)
+                _insert(key, built)
+                print(f"Map generated: {name} {built.info['width']}x{built.info['height']}, "
+                      f"origin=({built.info['origin_x']:.3f}, {built.info['origin_y']:.3f}), res={params.resolution}")
+                try:
+                    save_artifact(built)
+                except OSError as exc:
+                    print(f"[MAP] could not persist {name}: {exc}")
+    finally:
+        # also on a failed build ("Grid too big", unreadable DB): no lock left behind
+        with _LOCK:
+            _BUILD_LOCKS.pop(key, None)
+    return built
+
+
+def cache_stats() -> dict:
+    with _LOCK:
+        return {
+            "entries": [
+                {"map": b.name, "resolution": b.params.resolution, "z_range": b.info["z_range"],
+                 "stride": b.params.stride, "bytes": b.nbytes}
+                for b in _CACHE.values()
+            ],
+            "bytes": _CACHE_BYTES,
+            "budget_bytes": _budget_bytes(),
+        }
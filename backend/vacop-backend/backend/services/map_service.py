@@ -1,7 +1,7 @@
 import sqlite3
+import struct
 import zlib
 import numpy as np
-import matplotlib.pyplot as plt
 import os
 from flask import current_app
 
@@ -126,6 +126,67 @@ def compute_bounds_xy(
     return (min_x, min_y, max_x, max_y, total)
 
 
+class PackedGrid:
+    """
+    Occupancy grid stored at 1 bit per cell (np.packbits layout, MSB first): 1=occupied.
+
+    Row 0 is y = origin_y (bottom of the map), like the dense uint8 grid it replaces.
+    `packed` may be a read-only memmap when loaded from a map artifact.
+    """
+
+    def __init__(self, packed: np.ndarray, width: int):
+        self.packed = packed
+        self.width = width
+
+    @classmethod
+    def empty(cls, height: int, width: int) -> "PackedGrid":
+        return cls(np.zeros((height, (width + 7) // 8), dtype=np.uint8), width)
+
+    @classmethod
+    def from_dense(cls, grid: np.ndarray) -> "PackedGrid":
+        return cls(np.packbits(grid.astype(bool, copy=False), axis=1), grid.shape[1])
+
+    @property
+    def shape(self) -> tuple[int, int]:
+        return self.packed.shape[0], self.width
+
+    @property
+    def nbytes(self) -> int:
+        return self.packed.nbytes
+
+    def set_cells(self, iy: np.ndarray, ix: np.ndarray) -> None:
+        """Mark cells occupied (duplicates allowed)."""
+        bits = np.right_shift(np.uint8(0x80), (ix & 7).astype(np.uint8))
+        np.bitwise_or.at(self.packed, (iy, ix >> 3), bits)
+
+    def rows(self, start: int, stop: int) -> np.ndarray:
+        """Dense uint8 copy of rows [start, stop) only."""
+        return np.unpackbits(self.packed[start:stop], axis=1, count=self.width)
+
+    def to_dense(self) -> np.ndarray:
+        """Full uint8 grid; only for consumers that need per-cell arrays anyway (planning)."""
+        return self.rows(0, self.packed.shape[0])
+
+    def block_any(self, factor: int, rows_per_chunk: int = 1024) -> np.ndarray:
+        """
+        Bool grid downsampled by `factor`: a coarse cell is occupied if any of its cells is.
+
+        Unpacks a band of rows at a time, the full-resolution grid is never dense in memory.
+        Coarse cell (0, 0) starts at the same origin; edge cells cover the padding as free.
+        """
+        height, width = self.shape
+        out = np.zeros((-(-height // factor), -(-width // factor)), dtype=bool)
+        step = factor * max(1, rows_per_chunk // factor)
+        for start in range(0, height, step):
+            block = self.rows(start, min(height, start + step)).astype(bool)
+            pad_h, pad_w = -block.shape[0] % factor, -width % factor
+            if pad_h or pad_w:
+                block = np.pad(block, ((0, pad_h), (0, pad_w)))
+            coarse = block.reshape(block.shape[0] // factor, factor, -1, factor).any(axis=(1, 3))
+            out[start // factor:start // factor + coarse.shape[0]] = coarse
+        return out
+
+
 def build_occupancy_grid(
     db_path: str,
     resolution: float,
@@ -134,11 +195,13 @@ def build_occupancy_grid(
     max_points_per_scan: int | None = None,
     z_range: tuple[float, float] | None = None,
     padding_m: float = 1.0,
-    max_cells: int = 150_000_000,
+    max_cells: int = 1_200_000_000,
 ):
     """
-    Build occupancy grid (uint8): 1=occupied, 0=empty/unknown.
-    Returns: grid (H,W), origin_x, origin_y (meters), resolution
+    Build a bit-packed occupancy grid: 1=occupied, 0=empty/unknown.
+    Returns: grid (PackedGrid, H x W), origin_x, origin_y (meters), resolution
+
+    At 1 bit per cell, max_cells (1.2G) costs the same 150 MB as the former 150M-cell uint8 limit.
     """
     min_x, min_y, max_x, max_y, total_pts = compute_bounds_xy(
         db_path, limit_nodes, stride, max_points_per_scan, z_range
@@ -160,7 +223,7 @@ def build_occupancy_grid(
             f"Increase resolution or reduce bounds (z_range/limit_nodes/stride)."
         )
 
-    grid = np.zeros((height, width), dtype=np.uint8)
+    grid = PackedGrid.empty(height, width)
 
     # second pass: fill occupancy
     for xyz in iter_xyz_map(db_path, limit_nodes, stride, max_points_per_scan, z_range):
@@ -176,29 +239,62 @@ def build_occupancy_grid(
         if ix.size == 0:
             continue
 
-        grid[iy, ix] = 1
+        grid.set_cells(iy, ix)
 
     return grid, min_x, min_y, resolution
 
 
-def save_grid_png(grid: np.ndarray, out_png: str):
+def _png_chunk(tag: bytes, data: bytes) -> bytes:
+    return struct.pack(">I", len(data)) + tag + data + struct.pack(">I", zlib.crc32(tag + data) & 0xFFFFFFFF)
+
+
+def encode_grid_png(grid: PackedGrid, window: tuple[int, int, int, int] | None = None, rows_per_chunk: int = 512) -> bytes:
+    """
+    Encode the grid (or a window of it) as a 1-bit grayscale PNG: occupied -> black, free -> white.
+
+    The packed rows are already PNG 1-bit scanlines (MSB first), so they are inverted and
+    zlib-compressed a block of rows at a time, top row (max y) first; no full dense image is made.
+
+    window: (row0, row1, col0, col1) in grid cells, row1/col1 exclusive.
+    """
+    height, width = grid.shape
+    row0, row1, col0, col1 = window if window is not None else (0, height, 0, width)
+    out_w = col1 - col0
+    out_h = row1 - row0
+
+    comp = zlib.compressobj(6)
+    parts = []
+    # grid row 0 is y=min_y (bottom of the map), image row 0 is the top: emit grid rows from the end
+    for stop in range(row1, row0, -rows_per_chunk):
+        start = max(row0, stop - rows_per_chunk)
+        if col0 == 0 and col1 == width:
+            block = grid.packed[start:stop]
+        else:
+            # window not aligned on bytes: unpack only the bytes it covers, then shift by repacking
+            b0 = col0 >> 3
+            bits = np.unpackbits(grid.packed[start:stop, b0:(col1 + 7) >> 3], axis=1)
+            block = np.packbits(bits[:, col0 - 8 * b0:col1 - 8 * b0], axis=1)
+        block = np.invert(block[::-1])
+        lines = np.zeros((block.shape[0], block.shape[1] + 1), dtype=np.uint8)  # filter byte 0 = None
+        lines[:, 1:] = block
+        parts.append(comp.compress(lines.tobytes()))
+    parts.append(comp.flush())
+
+    ihdr = struct.pack(">IIBBBBB", out_w, out_h, 1, 0, 0, 0, 0)  # 1-bit grayscale
+    return b"".join([b"\x89PNG\r\n\x1a\n", _png_chunk(b"IHDR", ihdr), _png_chunk(b"IDAT", b"".join(parts)),
+                     _png_chunk(b"IEND", b"")])
+
+
+def save_grid_png(grid, out_png):
     """
-    Save occupancy grid to PNG.
-    1 (occupied) -> black, 0 -> white for easy viewing.
+    Save occupancy grid (PackedGrid or dense uint8 array) to PNG (`out_png` is a path or a binary file object).
+    1 (occupied) -> black, 0 -> white for easy viewing, map +y up (see encode_grid_png).
     """
-    # Flip logic: 1 is occupied -> black (0), 0 is empty -> white (255)
-    img = (1 - grid) * 255  
-    # Flip vertically because matplotlib origin is bottom-left but image file origin is top-left
-    # Actually build_occupancy_grid indices: ix corresponds to x, iy corresponds to y.
-    # If we want map 'up' to be +y, and image 'up' is -y (row 0), we need to flip the grid rows.
-    # map y=min_y -> row 0 in grid?
-    # In build_occupancy_grid:
-    # iy = floor((y - min_y) / res)
-    # y=min_y -> iy=0. y=max_y -> iy=height.
-    # So grid[0,:] corresponds to y=min_y (bottom of map).
-    # grid[height-1,:] corresponds to y=max_y (top of map).
-    # When saving to image, row 0 is top. So we must flip the array vertically so that
-    # the top of the image corresponds to max_y.
-    img_flipped = np.flipud(img)
-    
-    plt.imsave(out_png, img_flipped.astype(np.uint8), cmap="gray", vmin=0, vmax=255)
+    if not isinstance(grid, PackedGrid):
+        grid = PackedGrid.from_dense(grid)
+    data = encode_grid_png(grid)
+    if isinstance(out_png, (str, os.PathLike)):
+        with open(out_png, "wb") as f:
+            f.write(data)
+    else:
+        out_png.write(data)
@@ -0,0 +1,97 @@
+import threading
+
+from backend.extensions import db
+from backend.models import Mission
+from backend.services.shared_state import get_redis
+
+_LOCK = threading.Lock()
+_ACTIVE = {}  # robot_id -> mission id
+_LOADED = False
+
+# Redis hash robot_id -> mission id when several workers run (REDIS_URL set),
+# so an abort handled by another worker than the start still finds the mission.
+_REDIS_KEY = "vacop:missions:active"
+
+
+def _load_active_missions():
+    """Fill the cache from the DB once (indexed lookup on missions.status)."""
+    global _LOADED
+    rows = (
+        db.session.query(Mission.id, Mission.robot_id)
+        .filter(Mission.status == 'active')
+        .order_by(Mission.id)
+        .all()
+    )
+    with _LOCK:
+        if _LOADED:
+            return
+        for mission_id, robot_id in rows:
+            _ACTIVE[robot_id] = mission_id
+        _LOADED = True
+    r = get_redis()
+    if r is not None:
+        try:
+            for mission_id, robot_id in rows:
+                r.hsetnx(_REDIS_KEY, robot_id, mission_id)
+        except Exception as exc:
+            print("[STATE] Failed to share active missions:", exc)
+
+
+def _active_mission_from_db(robot_id: str):
+    """Latest active mission of a robot, straight from the DB (Redis unavailable)."""
+    row = (
+        db.session.query(Mission.id)
+        .filter(Mission.status == 'active', Mission.robot_id == robot_id)
+        .order_by(Mission.id.desc())
+        .first()
+    )
+    return row[0] if row else None
+
+
+def set_active_mission(robot_id: str, mission_id: int):
+    with _LOCK:
+        _ACTIVE[robot_id] = mission_id
+    r = get_redis()
+    if r is not None:
+        try:
+            r.hset(_REDIS_KEY, robot_id, mission_id)
+        except Exception as exc:
+            # other workers fall back to the DB, where the mission is already 'active'
+            print("[STATE] Failed to share active mission:", exc)
+
+
+def clear_active_mission(robot_id: str, mission_id: int | None = None):
+    """Forget the active mission of a robot (only if it is still `mission_id` when given)."""
+    with _LOCK:
+        if mission_id is None or _ACTIVE.get(robot_id) == mission_id:
+            _ACTIVE.pop(robot_id, None)
+    r = get_redis()
+    if r is not None:
+        try:
+            if mission_id is None or r.hget(_REDIS_KEY, robot_id) == str(mission_id):
+                r.hdel(_REDIS_KEY, robot_id)
+        except Exception as exc:
+            print("[STATE] Failed to clear shared active mission:", exc)
+
+
+def get_active_mission_id(robot_id: str):
+    """
+    Return the active mission id of a robot, or None.
+
+    Start/abort keep the cache up to date, so the DB is only read the first
+    time after a process restart (needs an app context). When Redis is configured
+    but unreachable, the DB is read instead: the local cache may miss missions
+    started on another worker.
+    """
+    if not _LOADED:
+        _load_active_missions()
+    r = get_redis()
+    if r is not None:
+        try:
+            value = r.hget(_REDIS_KEY, robot_id)
+            return int(value) if value is not None else None
+        except Exception as exc:
+            print("[STATE] Failed to read shared active mission, using the DB:", exc)
+            return _active_mission_from_db(robot_id)
+    with _LOCK:
+        return _ACTIVE.get(robot_id)
@@ -1,18 +1,56 @@
 import os
 import json
+import queue
+import threading
 from datetime import datetime
 
 from flask_mqtt import Mqtt
+from sqlalchemy.exc import OperationalError
 
 from backend.extensions import socketio, db
-from backend.models import RobotPosition
+from backend.models import RobotPosition, Log
 from backend.services.telemetry_state import set_latest_position
+from backend.services.shared_state import get_redis, WORKER_ID
+from backend.utils.telemetry_raw import compact_raw, raw_policy, typed_values
+from backend.utils.lazy import lazy_import
+
+# NumPy-based, loaded by the first fix (or the startup prewarm)
+geo_projection = lazy_import("backend.services.geo_projection")
+geofence_service = lazy_import("backend.services.geofence_service")
 
 mqtt_client = Mqtt()
 
 # Explicit Flask app reference for MQTT callbacks (they run outside request contexts).
 _FLASK_APP = None
 
+# Positions waiting to be written by the background writer (bounded: a stalled DB drops
+# rows instead of growing memory or delaying the real-time pipeline).
+_PERSIST_QUEUE = queue.Queue(maxsize=int(os.getenv("TELEMETRY_PERSIST_QUEUE", "10000")))
+_PERSIST_BATCH = 200
+# What is kept of the original message in robot_positions.raw / raw_z
+_RAW_POLICY = raw_policy()
+_WRITER_LOCK = threading.Lock()
+_WRITER_STARTED = False
+
+# Multi-worker ingest (each GNSS message must be persisted exactly once):
+#   - "all":    every worker subscribes (single-process default)
+#   - "shared": MQTT shared subscription $share/<MQTT_SHARED_GROUP>/<topic>, the broker
+#               delivers each message to one worker of the group
+#   - "leader": only the worker holding a Redis lease subscribes (brokers without $share)
+_INGEST_MODE = os.getenv("MQTT_INGEST_MODE", "all").strip().lower()
+_LEADER_KEY = "vacop:mqtt:ingest_leader"
+_LEADER_TTL_S = 10
+_IS_LEADER = False
+_LEADER_STARTED = False
+
+# Extend the lease only if this worker still owns it.
+_RENEW_SCRIPT = """
+if redis.call('get', KEYS[1]) == ARGV[1] then
+  return redis.call('pexpire', KEYS[1], ARGV[2])
+end
+return 0
+"""
+
 
 def set_flask_app(app) -> None:
     """
@@ -58,13 +96,77 @@ def _ts_to_utc_datetime(ts_raw):
 @mqtt_client.on_connect()
 def handle_connect(client, userdata, flags, rc):
     """
-    Subscribe to the GNSS topic when the MQTT client connects.
+    Subscribe to the GNSS topic when the MQTT client connects (see MQTT_INGEST_MODE).
     """
-    topic = os.getenv("MQTT_TOPIC", "robot/gnss")
+    if _INGEST_MODE == "leader":
+        print("[MQTT] connected rc=", rc, "to", client._host, ":", client._port, "ingest=leader")
+        _ensure_leader_election()
+        if _IS_LEADER:
+            mqtt_client.subscribe(_ingest_topic())
+        return
+
+    topic = _ingest_topic()
     mqtt_client.subscribe(topic)
     print("[MQTT] connected rc=", rc, "to", client._host, ":", client._port, "subscribed", topic)
 
 
+def _ingest_topic() -> str:
+    topic = os.getenv("MQTT_TOPIC", "robot/gnss")
+    if _INGEST_MODE == "shared":
+        group = os.getenv("MQTT_SHARED_GROUP", "vacop_backend")
+        return f"$share/{group}/{topic}"
+    return topic
+
+
+def _ensure_leader_election() -> None:
+    """Start the lease loop once (a greenthread under eventlet)."""
+    global _LEADER_STARTED
+    with _WRITER_LOCK:
+        if _LEADER_STARTED:
+            return
+        _LEADER_STARTED = True
+    socketio.start_background_task(_leader_loop)
+
+
+def _leader_loop() -> None:
+    """
+    Acquire or renew the ingest lease every TTL/3 and (un)subscribe accordingly.
+
+    If the leader dies, its lease expires after _LEADER_TTL_S and another worker
+    takes over; messages published in between are not ingested.
+    While Redis is unreachable the current leader keeps ingesting (no other worker can take
+    the lease meanwhile); if no worker held it, nothing is ingested until Redis is back.
+    """
+    global _IS_LEADER
+    r = get_redis()
+    if r is None:
+        print("[MQTT] MQTT_INGEST_MODE=leader needs REDIS_URL, ingesting on this worker")
+        _IS_LEADER = True
+        mqtt_client.subscribe(_ingest_topic())
+        return
+
+    ttl_ms = _LEADER_TTL_S * 1000
+    while True:
+        try:
+            if _IS_LEADER:
+                leader = bool(r.eval(_RENEW_SCRIPT, 1, _LEADER_KEY, WORKER_ID, ttl_ms))
+            else:
+                leader = bool(r.set(_LEADER_KEY, WORKER_ID, nx=True, px=ttl_ms))
+        except Exception as exc:
+            print("[MQTT] leader election error:", exc)
+            leader = _IS_LEADER
+
+        if leader and not _IS_LEADER:
+            mqtt_client.subscribe(_ingest_topic())
+            print("[MQTT] worker", WORKER_ID, "is now the ingest leader")
+        elif not leader and _IS_LEADER:
+            mqtt_client.unsubscribe(_ingest_topic())
+            print("[MQTT] worker", WORKER_ID, "lost the ingest lease")
+        _IS_LEADER = leader
+
+        socketio.sleep(_LEADER_TTL_S / 3)
+
+
 @mqtt_client.on_message()
 def handle_mqtt_message(client, userdata, message):
     """
@@ -72,9 +174,10 @@ def handle_mqtt_message(client, userdata, message):
 
     Real-time pipeline:
       MQTT -> parse -> payload -> set_latest_position -> socketio.emit("robot:position")
+      MQTT -> parse -> geofence check -> socketio.emit("geofence:event") + Log rows
 
     Persistence pipeline:
-      MQTT -> parse -> RobotPosition row -> Postgres
+      MQTT -> parse -> persist queue -> writer greenthread (batched RobotPosition rows) -> Postgres
     """
     try:
         text = message.payload.decode("utf-8", errors="replace")
@@ -100,8 +203,14 @@ def handle_mqtt_message(client, userdata, message):
             return v / 1e7
         return float(v)
 
-    lat = to_deg(lat_raw)
-    lng = to_deg(lon_raw)
+    try:
+        lat = to_deg(lat_raw)
+        lng = to_deg(lon_raw)
+    except (TypeError, ValueError, OverflowError):
+        # an exception here would kill paho's network thread and stop all ingestion
+        print("[MQTT] Skipping message with invalid coordinates:", text[:200])
+        return
+    robot_id = str(data.get("robot_id", "robot_1"))
 
     payload = {
         "ts": datetime.utcnow().isoformat() if ts_raw is None else ts_raw,
@@ -110,34 +219,118 @@ def handle_mqtt_message(client, userdata, message):
         "topic": message.topic,
     }
 
+    # Map frame position for overlays on the static map (projected once per fix).
+    anchor = geo_projection.get_geo_anchor(_FLASK_APP.config) if _FLASK_APP is not None else None
+    if anchor is not None:
+        x, y = anchor.to_map(lat, lng)
+        payload["x"] = round(float(x), 3)
+        payload["y"] = round(float(y), 3)
+
     # 1) Real-time update to the frontend.
     set_latest_position(payload)
     socketio.emit("robot:position", payload)
 
-    # 2) Persist to DB for trajectory/history.
     if _FLASK_APP is None:
         # This means set_flask_app(app) was not called during app initialization.
         print("[DB] Skipping persist: Flask app not registered (call set_flask_app(app)).")
         return
 
+    # 2) Geofence enter/exit alerts (spatial index lookup, DB only when zones changed).
     try:
-        with _FLASK_APP.app_context():
-            row = RobotPosition(
-                robot_id=str(data.get("robot_id", "robot_1")),
-                ts=_ts_to_utc_datetime(ts_raw),
-                lat=lat,
-                lng=lng,
-                topic=message.topic,
-                raw=data,
-            )
-            db.session.add(row)
+        events = geofence_service.check_position(_FLASK_APP, robot_id, lat, lng)
+    except Exception as exc:
+        print("[GEOFENCE] check failed:", exc)
+        events = []
+    for ev in events:
+        socketio.emit("geofence:event", {**ev, "ts": payload["ts"]})
+    if events:
+        socketio.start_background_task(_write_geofence_logs, events)
+
+    # 3) Persist to DB for trajectory/history.
+    # The insert happens in the writer greenthread, never on the MQTT callback.
+    # Never let a bad message raise: paho re-raises callback exceptions and its network thread dies.
+    try:
+        row = dict(
+            robot_id=robot_id,
+            ts=_ts_to_utc_datetime(ts_raw),
+            lat=lat,
+            lng=lng,
+            topic=message.topic,
+            **compact_raw(data, _RAW_POLICY, typed_values(robot_id, lat, lng)),
+        )
+    except Exception as exc:
+        print("[DB] Skipping RobotPosition, bad message:", exc, text[:200])
+        return
+
+    _ensure_writer()
+    try:
+        _PERSIST_QUEUE.put_nowait(row)
+    except queue.Full:
+        print("[DB] persist queue full, dropping RobotPosition")
+
+
+def _write_geofence_logs(events: list) -> None:
+    """Store geofence events as Log rows (background task, off the MQTT callback)."""
+    with _FLASK_APP.app_context():
+        try:
+            db.session.add_all([
+                Log(level=ev["level"], source="geofence", message=geofence_service.event_message(ev))
+                for ev in events
+            ])
             db.session.commit()
+        except Exception as exc:
+            db.session.rollback()
+            print("[DB] Failed to persist geofence logs:", exc)
 
-            # Keep this log while validating the pipeline.
-            print("[DB] inserted RobotPosition id=", row.id, "robot_id=", row.robot_id)
-    except Exception as exc:
-        db.session.rollback()
-        print("[DB] Failed to persist RobotPosition:", exc)
+
+def _ensure_writer() -> None:
+    """Start the background DB writer once (a greenthread under eventlet)."""
+    global _WRITER_STARTED
+    with _WRITER_LOCK:
+        if _WRITER_STARTED:
+            return
+        _WRITER_STARTED = True
+    socketio.start_background_task(_persist_worker)
+
+
+def _persist_worker() -> None:
+    """
+    Drain the persist queue and insert RobotPosition rows in batches.
+
+    With green psycopg2 (utils/green.py) the commit only suspends this greenthread,
+    so a slow DB never delays Socket.IO pushes or HTTP requests.
+    """
+    while True:
+        rows = [_PERSIST_QUEUE.get()]
+        while len(rows) < _PERSIST_BATCH:
+            try:
+                rows.append(_PERSIST_QUEUE.get_nowait())
+            except queue.Empty:
+                break
+
+        with _FLASK_APP.app_context():
+            try:
+                db.session.add_all([RobotPosition(**r) for r in rows])
+                db.session.commit()
+            except OperationalError as exc:
+                # DB unreachable: every row would fail the same way
+                db.session.rollback()
+                print("[DB] Failed to persist RobotPosition batch:", exc)
+            except Exception as exc:
+                db.session.rollback()
+                print("[DB] Failed to persist RobotPosition batch, retrying row by row:", exc)
+                _persist_rows_one_by_one(rows)
+
+
+def _persist_rows_one_by_one(rows: list) -> None:
+    """Fallback after a failed batch: only the offending rows are dropped (e.g. NaN in raw)."""
+    for r in rows:
+        try:
+            db.session.add(RobotPosition(**r))
+            db.session.commit()
+        except Exception as exc:
+            db.session.rollback()
+            print("[DB] Dropping RobotPosition", r.get("robot_id"), r.get("ts"), ":", exc)
 
 
 def publish_command(command: str, payload: dict) -> None:
@@ -0,0 +1,347 @@
+import heapq
+import math
+import os
+import threading
+
+import numpy as np
+
+from backend.extensions import socketio
+from backend.services.map_service import PackedGrid
+from backend.utils.green import run_cpu_bound
+
+# Obstacle distances are only computed exactly up to this cap (meters);
+# anything further away is reported as CLEARANCE_CAP_M.
+CLEARANCE_CAP_M = 2.0
+
+# Above this many cells the index is built on a coarser grid (PLANNING_MAX_CELLS): the index needs
+# ~20 bytes per cell at peak (EDT, labels), 25M cells ~ 500 MB, whatever the occupancy grid allows.
+PLANNING_MAX_CELLS = int(os.getenv("PLANNING_MAX_CELLS", "25000000"))
+
+_SQRT2 = math.sqrt(2.0)
+
+
+def planning_factor(cells: int, max_cells: int = PLANNING_MAX_CELLS) -> int:
+    """Smallest integer downsampling factor bringing `cells` under `max_cells`."""
+    factor = 1
+    while cells / (factor * factor) > max_cells:
+        factor += 1
+    return factor
+
+
+def obstacle_distance(occupied: np.ndarray, resolution: float, max_dist_m: float) -> np.ndarray:
+    """
+    Euclidean distance (meters, float32) from each cell to the nearest occupied cell,
+    capped at max_dist_m.
+
+    Separable exact EDT restricted to a window of R = max_dist_m / resolution cells:
+    a vertical pass gives the distance to the nearest obstacle in the same column,
+    then a horizontal pass combines columns with d2(x) = min g2(x') + (x - x')^2.
+    Both passes are 2R whole-grid NumPy operations.
+    """
+    h, w = occupied.shape
+    r = max(1, int(math.ceil(max_dist_m / resolution)))
+    far = r + 1
+
+    # vertical pass: g = rows to the nearest obstacle in the column (far if > r)
+    g = np.full((h, w), far, dtype=np.int32)
+    g[occupied] = 0
+    for d in range(1, min(r, h - 1) + 1):
+        below = g[d:]
+        below[occupied[:-d] & (below > d)] = d
+        above = g[:-d]
+        above[occupied[d:] & (above > d)] = d
+
+    # horizontal pass on squared distances
+    g2 = g * g
+    del g
+    d2 = g2.copy()
+    for d in range(1, min(r, w - 1) + 1):
+        dd = d * d
+        np.minimum(d2[:, d:], g2[:, :-d] + dd, out=d2[:, d:])
+        np.minimum(d2[:, :-d], g2[:, d:] + dd, out=d2[:, :-d])
+    del g2
+
+    dist = np.sqrt(d2.astype(np.float32))
+    dist *= np.float32(resolution)
+    np.minimum(dist, np.float32(max_dist_m), out=dist)
+    return dist
+
+
+def label_components(free: np.ndarray) -> tuple[np.ndarray, int]:
+    """
+    Label 4-connected components of free cells (0 = blocked, 1..n = component id).
+
+    Works on horizontal runs instead of cells: runs are found with one vectorized diff,
+    then a union-find merges overlapping runs of consecutive rows.
+    """
+    h, w = free.shape
+    padded = np.zeros((h, w + 2), dtype=np.int8)
+    padded[:, 1:-1] = free
+    edges = np.diff(padded, axis=1)
+    run_rows, run_starts = np.nonzero(edges == 1)
+    _, run_ends = np.nonzero(edges == -1)  # exclusive, same row-major order as starts
+
+    n_runs = run_rows.size
+    labels = np.zeros((h, w), dtype=np.int32)
+    if n_runs == 0:
+        return labels, 0
+
+    parent = list(range(n_runs))
+
+    def find(i):
+        while parent[i] != i:
+            parent[i] = parent[parent[i]]
+            i = parent[i]
+        return i
+
+    # first run index of every row (rows without runs get an empty slice)
+    row_first = np.searchsorted(run_rows, np.arange(h + 1)).tolist()
+    starts = run_starts.tolist()
+    ends = run_ends.tolist()
+
+    for y in range(1, h):
+        a, a_end = row_first[y - 1], row_first[y]
+        b, b_end = row_first[y], row_first[y + 1]
+        # two-pointer sweep over the runs of rows y-1 and y
+        while a < a_end and b < b_end:
+            if starts[a] < ends[b] and starts[b] < ends[a]:
+                ra, rb = find(a), find(b)
+                if ra != rb:
+                    parent[rb] = ra
+            if ends[a] < ends[b]:
+                a += 1
+            else:
+                b += 1
+
+    roots = np.array([find(i) for i in range(n_runs)], dtype=np.int64)
+    _, run_labels = np.unique(roots, return_inverse=True)
+    run_labels = (run_labels + 1).astype(np.int32)
+
+    for y, s, e, lab in zip(run_rows.tolist(), starts, ends, run_labels.tolist()):
+        labels[y, s:e] = lab
+
+    return labels, int(run_labels.max())
+
+
+class PlanningIndex:
+    """
+    Precomputed planning data for one occupancy grid and robot radius.
+
+    - clearance: distance to the nearest obstacle (meters, capped)
+    - free: cells the robot center may occupy (clearance > robot radius)
+    - labels: connected components of `free`, so reachability is a single lookup
+
+    Grids above PLANNING_MAX_CELLS are planned on a coarser grid (`factor` x the map resolution,
+    a coarse cell is occupied if any of its cells is), which bounds the index memory.
+    """
+
+    def __init__(self, grid, origin_x: float, origin_y: float, resolution: float, robot_radius: float):
+        self.grid = grid
+        self.origin_x = origin_x
+        self.origin_y = origin_y
+        self.robot_radius = robot_radius
+
+        # the distance transform needs per-cell arrays: a bit-packed grid is unpacked (or downsampled) here only
+        if not isinstance(grid, PackedGrid):
+            grid = PackedGrid.from_dense(grid)
+        height, width = grid.shape
+        self.factor = planning_factor(height * width)
+        occupied = grid.block_any(self.factor) if self.factor > 1 else grid.to_dense().astype(bool)
+        self.resolution = resolution * self.factor
+        self.height, self.width = occupied.shape
+
+        self.clearance = obstacle_distance(occupied, self.resolution, max(CLEARANCE_CAP_M, robot_radius))
+        self.free = self.clearance > robot_radius
+        self.labels, self.n_components = label_components(self.free)
+        # bytes indexing is much cheaper than NumPy scalar access inside the A* loop
+        self._free_flat = self.free.astype(np.uint8).tobytes()
+
+    def world_to_cell(self, x: float, y: float):
+        """Map frame meters -> (row, col), or None outside the grid or not finite (row 0 is y = origin_y)."""
+        if not (math.isfinite(x) and math.isfinite(y)):
+            return None
+        col = int(math.floor((x - self.origin_x) / self.resolution))
+        row = int(math.floor((y - self.origin_y) / self.resolution))
+        if 0 <= row < self.height and 0 <= col < self.width:
+            return row, col
+        return None
+
+    def cell_to_world(self, row: int, col: int):
+        """Cell center in map frame meters."""
+        return (
+            self.origin_x + (col + 0.5) * self.resolution,
+            self.origin_y + (row + 0.5) * self.resolution,
+        )
+
+    def check_point(self, x: float, y: float) -> dict:
+        """Describe a map frame position: inside the map, clearance, free for the robot, component."""
+        cell = self.world_to_cell(x, y)
+        if cell is None:
+            return {"ok": False, "reason": "out_of_map"}
+        row, col = cell
+        clearance = float(self.clearance[row, col])
+        if not self.free[row, col]:
+            return {"ok": False, "reason": "in_obstacle", "clearance_m": clearance}
+        return {"ok": True, "clearance_m": clearance, "component": int(self.labels[row, col])}
+
+    def check_goal(self, start_xy, goal_xy) -> dict:
+        """Validate a goal against a start position in O(1)."""
+        goal = self.check_point(*goal_xy)
+        if not goal["ok"]:
+            return goal
+        if start_xy is None:
+            return goal
+        start = self.check_point(*start_xy)
+        if not start["ok"]:
+            # The robot may be localized close to a wall; only the goal has to be valid then.
+            return goal
+        if start["component"] != goal["component"]:
+            return {"ok": False, "reason": "unreachable", "clearance_m": goal["clearance_m"]}
+        return goal
+
+    def plan(self, start_xy, goal_xy, max_expansions: int = 300_000) -> dict:
+        """
+        8-connected A* (octile heuristic, no corner cutting) on the inflated grid.
+
+        Reachability is checked first on the component labels, so A* only runs when a
+        path exists. Returns map frame waypoints with collinear points removed.
+        """
+        check = self.check_goal(start_xy, goal_xy)
+        if not check["ok"]:
+            return check
+        start_cell = self.world_to_cell(*start_xy)
+        if start_cell is None or not self.free[start_cell]:
+            return {"ok": False, "reason": "start_blocked"}
+
+        w = self.width
+        free = self._free_flat
+        start = start_cell[0] * w + start_cell[1]
+        gr, gc = self.world_to_cell(*goal_xy)
+        goal = gr * w + gc
+
+        def heuristic(idx):
+            dy = abs(idx // w - gr)
+            dx = abs(idx % w - gc)
+            return (dx + dy) + (_SQRT2 - 2.0) * min(dx, dy)
+
+        g_score = {start: 0.0}
+        came_from = {}
+        open_heap = [(heuristic(start), 0.0, start)]
+        closed = set()
+        expansions = 0
+
+        while open_heap:
+            _, g, cur = heapq.heappop(open_heap)
+            if cur == goal:
+                break
+            if cur in closed:
+                continue
+            closed.add(cur)
+            expansions += 1
+            if expansions > max_expansions:
+                return {"ok": False, "reason": "search_limit", "expansions": expansions}
+
+            r, c = divmod(cur, w)
+            up = r + 1 < self.height and free[cur + w]
+            down = r > 0 and free[cur - w]
+            right = c + 1 < w and free[cur + 1]
+            left = c > 0 and free[cur - 1]
+
+            neighbors = []
+            if up:
+                neighbors.append((cur + w, 1.0))
+            if down:
+                neighbors.append((cur - w, 1.0))
+            if right:
+                neighbors.append((cur + 1, 1.0))
+            if left:
+                neighbors.append((cur - 1, 1.0))
+            if up and right and free[cur + w + 1]:
+                neighbors.append((cur + w + 1, _SQRT2))
+            if up and left and free[cur + w - 1]:
+                neighbors.append((cur + w - 1, _SQRT2))
+            if down and right and free[cur - w + 1]:
+                neighbors.append((cur - w + 1, _SQRT2))
+            if down and left and free[cur - w - 1]:
+                neighbors.append((cur - w - 1, _SQRT2))
+
+            for nxt, cost in neighbors:
+                ng = g + cost
+                if ng < g_score.get(nxt, math.inf):
+                    g_score[nxt] = ng
+                    came_from[nxt] = cur
+                    heapq.heappush(open_heap, (ng + heuristic(nxt), ng, nxt))
+        else:
+            return {"ok": False, "reason": "unreachable"}
+
+        cells = [goal]
+        while cells[-1] != start:
+            cells.append(came_from[cells[-1]])
+        cells.reverse()
+
+        # keep only the cells where the direction changes
+        waypoints = [cells[0]]
+        for prev, cur, nxt in zip(cells, cells[1:], cells[2:]):
+            if cur - prev != nxt - cur:
+                waypoints.append(cur)
+        if len(cells) > 1:
+            waypoints.append(cells[-1])
+
+        path = [list(self.cell_to_world(*divmod(i, w))) for i in waypoints]
+        return {
+            "ok": True,
+            "path": path,
+            "length_m": round(g_score[goal] * self.resolution, 3),
+            "expansions": expansions,
+        }
+
+
+_LOCK = threading.Lock()
+_INDEX = None
+_PENDING_LOCK = threading.Lock()
+_PENDING = set()
+
+
+def get_planning_index(grid, info: dict, robot_radius: float) -> PlanningIndex:
+    """
+    Return the planning index of `grid`, building it only when the map or radius changed.
+
+    The index is shared by all requests; it is rebuilt once per generated map,
+    in a native thread (utils/green.py) so the build does not stall the eventlet hub.
+    """
+    global _INDEX
+    with _LOCK:
+        if _INDEX is None or _INDEX.grid is not grid or _INDEX.robot_radius != robot_radius:
+            _INDEX = run_cpu_bound(PlanningIndex, grid, info["origin_x"], info["origin_y"], info["resolution"],
+                                   robot_radius)
+            print(f"[PLAN] index built: {_INDEX.width}x{_INDEX.height} at {_INDEX.resolution:.3f} m, "
+                  f"{_INDEX.n_components} components, radius={robot_radius}m")
+        return _INDEX
+
+
+def peek_planning_index(grid, robot_radius: float):
+    """The index of `grid` if it is already built, else None (never builds, never waits for a build)."""
+    index = _INDEX
+    if index is not None and index.grid is grid and index.robot_radius == robot_radius:
+        return index
+    return None
+
+
+def build_planning_index_later(grid, info: dict, robot_radius: float) -> None:
+    """Build the index in a background task, at most one pending build per (grid, radius)."""
+    key = (id(grid), robot_radius)
+    with _PENDING_LOCK:
+        if key in _PENDING:
+            return
+        _PENDING.add(key)
+
+    def _build():
+        try:
+            get_planning_index(grid, info, robot_radius)
+        except Exception as exc:
+            print(f"[PLAN] background index build failed: {exc}")
+        finally:
+            with _PENDING_LOCK:
+                _PENDING.discard(key)
+
+    socketio.start_background_task(_build)
@@ -0,0 +1,180 @@
+import glob
+import hashlib
+import os
+import threading
+
+import numpy as np
+
+from backend.extensions import socketio
+from backend.services.map_artifact import artifact_dir, atomic_write
+from backend.services.map_service import iter_xyz_map
+from backend.utils.green import run_cpu_bound
+
+# Voxel size (meters) of each level of detail, 0 = coarsest
+LOD_VOXEL_M = (0.4, 0.2, 0.1, 0.05)
+
+# Points per streamed chunk (12 bytes each)
+CHUNK_POINTS = 65536
+
+# Voxel keys are packed as 3 x 21 bits: +/- 1M voxels per axis
+_KEY_BITS = 21
+_KEY_OFFSET = 1 << (_KEY_BITS - 1)
+_KEY_MASK = (1 << _KEY_BITS) - 1
+# Deduplicate the accumulated keys whenever this many are pending
+_DEDUP_EVERY = 4_000_000
+
+_LOCK = threading.Lock()
+_BUILDING = set()  # cache files being built
+_FAILED = {}  # cache file -> error of its last build
+
+
+def _pack_keys(xyz: np.ndarray, voxel: float) -> np.ndarray:
+    ijk = np.floor(xyz / voxel).astype(np.int64) + _KEY_OFFSET
+    ijk &= _KEY_MASK
+    return (ijk[:, 0] << (2 * _KEY_BITS)) | (ijk[:, 1] << _KEY_BITS) | ijk[:, 2]
+
+
+def _unpack_centers(keys: np.ndarray, voxel: float) -> np.ndarray:
+    ijk = np.empty((keys.size, 3), dtype=np.int64)
+    ijk[:, 0] = (keys >> (2 * _KEY_BITS)) & _KEY_MASK
+    ijk[:, 1] = (keys >> _KEY_BITS) & _KEY_MASK
+    ijk[:, 2] = keys & _KEY_MASK
+    return ((ijk - _KEY_OFFSET + 0.5) * voxel).astype(np.float32)
+
+
+def _cache_prefix(db_path: str) -> str:
+    digest = hashlib.sha1(os.path.abspath(db_path).encode("utf-8")).hexdigest()[:16]
+    return os.path.join(artifact_dir(), f"pcd_{digest}")
+
+
+def build_voxel_cloud(db_path: str, voxel: float) -> np.ndarray:
+    """
+    Voxel-downsample every scan of the RTAB-Map DB into one (N, 3) float32 cloud of voxel centers.
+
+    Scans are streamed; only the 8-byte voxel keys are kept, deduplicated as they accumulate,
+    so memory follows the size of the output cloud rather than the raw scans.
+    """
+    seen = np.empty(0, dtype=np.int64)
+    pending = []
+    pending_n = 0
+
+    for xyz in iter_xyz_map(db_path, limit_nodes=None, stride=1, max_points_per_scan=None, z_range=None):
+        keys = np.unique(_pack_keys(xyz, voxel))
+        pending.append(keys)
+        pending_n += keys.size
+        if pending_n >= _DEDUP_EVERY:
+            seen = np.unique(np.concatenate([seen] + pending))
+            pending, pending_n = [], 0
+
+    seen = np.unique(np.concatenate([seen] + pending))
+    return _unpack_centers(seen, voxel)
+
+
+def _cloud_file(db_path: str, lod: int):
+    """(cache file path, prefix) of (db, LOD); the name embeds the DB mtime."""
+    mtime_ns = os.stat(db_path).st_mtime_ns
+    prefix = _cache_prefix(db_path)
+    return f"{prefix}_{mtime_ns}_lod{lod}.npy", prefix
+
+
+def _build_and_save(db_path: str, lod: int, path: str, prefix: str) -> int:
+    """Build, write and clean older versions; pure CPU + file I/O, runs in a native thread."""
+    cloud = build_voxel_cloud(db_path, LOD_VOXEL_M[lod])
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    atomic_write(path, lambda f: np.save(f, cloud, allow_pickle=False))
+    for stale in glob.glob(f"{prefix}_*_lod{lod}.npy"):
+        if stale != path:
+            os.remove(stale)
+    return cloud.shape[0]
+
+
+def _build(db_path: str, lod: int, path: str, prefix: str) -> None:
+    """Background task: one build per file, the CPU work off the eventlet hub."""
+    try:
+        n = run_cpu_bound(_build_and_save, db_path, lod, path, prefix)
+        print(f"[PCD] built lod={lod} voxel={LOD_VOXEL_M[lod]}m: {n:,} points")
+    except Exception as exc:
+        print(f"[PCD] build failed lod={lod}: {exc}")
+        with _LOCK:
+            _FAILED[path] = str(exc)
+    finally:
+        with _LOCK:
+            _BUILDING.discard(path)
+
+
+def request_cloud(db_path: str, lod: int):
+    """
+    Cached cloud (.npy, float32 (N, 3)) of (db, LOD) without waiting for a build.
+
+    Returns (path, None) when ready, (None, None) while it is being built (the build is started
+    on the first call), or (None, error) once if the last build failed (the next call retries).
+    The file name embeds the DB mtime: a modified DB gets a new file and older ones are removed.
+    """
+    path, prefix = _cloud_file(db_path, lod)
+    if os.path.exists(path):
+        return path, None
+    with _LOCK:
+        if path in _FAILED:
+            return None, _FAILED.pop(path)
+        if path in _BUILDING:
+            return None, None
+        _BUILDING.add(path)
+    socketio.start_background_task(_build, db_path, lod, path, prefix)
+    return None, None
+
+
+def _crop_mask(chunk: np.ndarray, bbox):
+    lo = np.asarray(bbox[:3], dtype=np.float32)
+    hi = np.asarray(bbox[3:], dtype=np.float32)
+    return ((chunk >= lo) & (chunk <= hi)).all(axis=1)
+
+
+def _iter_chunks(cloud: np.ndarray, bbox):
+    for start in range(0, cloud.shape[0], CHUNK_POINTS):
+        chunk = np.asarray(cloud[start:start + CHUNK_POINTS])
+        if bbox is not None:
+            chunk = chunk[_crop_mask(chunk, bbox)]
+        if chunk.shape[0]:
+            yield chunk
+
+
+def count_points(path: str, bbox=None) -> int:
+    cloud = np.load(path, mmap_mode="r", allow_pickle=False)
+    if bbox is None:
+        return int(cloud.shape[0])
+    return sum(chunk.shape[0] for chunk in _iter_chunks(cloud, bbox))
+
+
+def stream_cloud(path: str, fmt: str = "bin", bbox=None):
+    """
+    Yield the cloud as bytes, one chunk at a time from the memory-mapped cache file.
+
+    fmt:
+      - "bin": little-endian float32 x, y, z per point (no header)
+      - "ply": binary_little_endian PLY (the point count is computed by a first pass when cropping)
+    """
+    cloud = np.load(path, mmap_mode="r", allow_pickle=False)
+    if fmt == "ply":
+        n = count_points(path, bbox)
+        header = (
+            "ply\n"
+            "format binary_little_endian 1.0\n"
+            f"element vertex {n}\n"
+            "property float x\n"
+            "property float y\n"
+            "property float z\n"
+            "end_header\n"
+        )
+        yield header.encode("ascii")
+    for chunk in _iter_chunks(cloud, bbox):
+        yield chunk.astype("<f4", copy=False).tobytes()
+
+
+def parse_bbox(raw: str | None):
+    """'xmin,ymin,zmin,xmax,ymax,zmax' (map frame meters) -> tuple, None if absent. Raises ValueError."""
+    if not raw:
+        return None
+    vals = tuple(float(v) for v in raw.split(","))
+    if len(vals) != 6 or any(vals[i] > vals[i + 3] for i in range(3)):
+        raise ValueError("bbox must be xmin,ymin,zmin,xmax,ymax,zmax")
+    return vals
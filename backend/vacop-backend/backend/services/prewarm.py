@@ -0,0 +1,131 @@
+import os
+import threading
+import time
+
+from sqlalchemy import text
+
+from backend.extensions import db, socketio
+from backend.models import RobotPosition
+from backend.services.telemetry_state import seed_latest_position
+from backend.utils.lazy import ensure_loaded, lazy_import
+
+# Modules deferred by lazy_import at startup, loaded first by the prewarm
+HEAVY_MODULES = (
+    "numpy",
+    "backend.services.map_service",
+    "backend.services.map_artifact",
+    "backend.services.map_registry",
+    "backend.services.planning_service",
+    "backend.services.geo_projection",
+    "backend.services.geofence_service",
+)
+
+_LOCK = threading.Lock()
+_DONE = threading.Event()
+_STATUS = {"state": "idle", "steps": {}}
+
+
+def prewarm_enabled() -> bool:
+    return os.getenv("STARTUP_PREWARM", "1").lower() not in ("0", "false", "no", "off")
+
+
+def _warm_modules(app) -> None:
+    for name in HEAVY_MODULES:
+        ensure_loaded(lazy_import(name))
+
+
+def _warm_db_pool(app) -> None:
+    """Open pool_size connections at once so the first requests do not pay for TCP + auth."""
+    n = app.config.get("SQLALCHEMY_ENGINE_OPTIONS", {}).get("pool_size", 5)
+    with app.app_context():
+        conns = []
+        try:
+            for _ in range(n):
+                conn = db.engine.connect()
+                conns.append(conn)
+                conn.execute(text("SELECT 1"))
+        finally:
+            for conn in conns:
+                conn.close()
+
+
+def _warm_latest_position(app) -> None:
+    """Last persisted fix into the latest-position cache (GET /api/telemetry/latest without a DB hit)."""
+    with app.app_context():
+        row = db.session.query(RobotPosition).order_by(RobotPosition.ts.desc()).first()
+        if row is not None:
+            seed_latest_position(row.to_dict())
+
+
+def _warm_map(app) -> None:
+    """
+    Default map from its persisted artifact, and its planning index (used by /goal and /plan).
+
+    Never builds a map from the RTAB-Map DB (minutes of CPU), so without an artifact the first
+    request builds it as before. The index build itself runs in a native thread (run_cpu_bound in
+    get_planning_index), the hub keeps serving meanwhile.
+    """
+    from backend.routes.map import get_planning_index_for_map
+    map_registry = lazy_import("backend.services.map_registry")
+    if map_registry.get_persisted_map() is None:
+        print("[PREWARM] no map artifact, the default map is built on first use")
+        return
+    with app.app_context():
+        get_planning_index_for_map()
+
+
+STEPS = (
+    ("modules", _warm_modules),
+    ("db_pool", _warm_db_pool),
+    ("latest_position", _warm_latest_position),
+    ("map", _warm_map),
+)
+
+
+def _run(app) -> None:
+    started = time.perf_counter()
+    for name, step in STEPS:
+        t0 = time.perf_counter()
+        try:
+            step(app)
+            result = {"ok": True}
+        except Exception as exc:
+            # a failed step only means that resource is loaded on first use, as without prewarm
+            print(f"[PREWARM] {name} failed: {exc}")
+            result = {"ok": False, "error": str(exc)}
+        result["ms"] = round((time.perf_counter() - t0) * 1000, 1)
+        with _LOCK:
+            _STATUS["steps"][name] = result
+        print(f"[PREWARM] {name}: {result['ms']} ms")
+    with _LOCK:
+        _STATUS["state"] = "done"
+        _STATUS["total_ms"] = round((time.perf_counter() - started) * 1000, 1)
+    _DONE.set()
+
+
+def start_prewarm(app) -> bool:
+    """
+    Load the heavy modules and warm the caches in a background task, once per process.
+
+    The server accepts requests meanwhile; a request needing something not warmed yet
+    just loads it itself. Map and index builds are locked, never done twice; lazy modules are not
+    (LazyLoader has no lock on Python 3.10), module bodies never yield to the hub so a greenthread
+    cannot see one half executed.
+    """
+    if not prewarm_enabled():
+        return False
+    with _LOCK:
+        if _STATUS["state"] != "idle":
+            return False
+        _STATUS["state"] = "running"
+    socketio.start_background_task(_run, app)
+    return True
+
+
+def prewarm_status() -> dict:
+    with _LOCK:
+        return {**_STATUS, "steps": dict(_STATUS["steps"])}
+
+
+def wait_prewarm(timeout: float | None = None) -> bool:
+    return _DONE.wait(timeout)
@@ -0,0 +1,26 @@
+import os
+import socket
+import threading
+
+# Unique id of this backend process (leader election, logs).
+WORKER_ID = f"{socket.gethostname()}-{os.getpid()}"
+
+_LOCK = threading.Lock()
+_CLIENT = None
+
+
+def get_redis():
+    """
+    Redis client shared by the workers, or None in single-process mode (REDIS_URL not set).
+
+    Any Redis-compatible server works (Redis, Valkey, KeyDB...).
+    """
+    global _CLIENT
+    url = os.getenv("REDIS_URL")
+    if not url:
+        return None
+    with _LOCK:
+        if _CLIENT is None:
+            import redis
+            _CLIENT = redis.Redis.from_url(url, decode_responses=True, socket_timeout=2)
+        return _CLIENT
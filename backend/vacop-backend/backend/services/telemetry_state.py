@@ -1,13 +1,50 @@
+import json
 import threading
 
+from backend.services.shared_state import get_redis
+
 _LOCK = threading.Lock()
 _LATEST_POS = None  # dict ou None
 
+# Redis key of the latest position when several workers run (REDIS_URL set)
+_REDIS_KEY = "vacop:telemetry:latest"
+
 def set_latest_position(pos: dict):
     global _LATEST_POS
     with _LOCK:
         _LATEST_POS = pos
+    r = get_redis()
+    if r is not None:
+        try:
+            r.set(_REDIS_KEY, json.dumps(pos))
+        except Exception as exc:
+            print("[STATE] Failed to share latest position:", exc)
+
+def seed_latest_position(pos: dict) -> bool:
+    """Fill the cache from the DB after a restart, unless a live fix already arrived (startup prewarm)."""
+    global _LATEST_POS
+    with _LOCK:
+        if _LATEST_POS is not None:
+            return False
+        _LATEST_POS = pos
+    r = get_redis()
+    if r is not None:
+        try:
+            # nx: never overwrite a fix shared by the ingesting worker
+            r.set(_REDIS_KEY, json.dumps(pos), nx=True)
+        except Exception as exc:
+            print("[STATE] Failed to share latest position:", exc)
+    return True
 
 def get_latest_position():
+    # Only the ingesting worker receives MQTT, the others read the shared copy.
+    r = get_redis()
+    if r is not None:
+        try:
+            raw = r.get(_REDIS_KEY)
+            if raw is not None:
+                return json.loads(raw)
+        except Exception as exc:
+            print("[STATE] Failed to read shared latest position:", exc)
     with _LOCK:
         return _LATEST_POS
@@ -0,0 +1,36 @@
+def setup_green_io() -> None:
+    """
+    Make blocking I/O cooperate with the eventlet hub used by Socket.IO.
+
+    Must run before Flask/SQLAlchemy/paho are imported (top of app.py):
+      - eventlet.monkey_patch(): sockets, threads, locks and queues become green.
+      - psycogreen: psycopg2 waits on the hub instead of blocking it, so a slow
+        query only suspends its own greenthread (live pushes and teleop keep flowing).
+    """
+    import eventlet
+    eventlet.monkey_patch()
+
+    try:
+        from psycogreen.eventlet import patch_psycopg
+    except ImportError:
+        print("[db] WARNING: psycogreen not installed, psycopg2 calls will block the eventlet hub")
+        return
+    patch_psycopg()
+
+
+def run_cpu_bound(fn, *args, **kwargs):
+    """
+    Run CPU-heavy work (map builds, distance transforms) in a native thread when eventlet is active.
+
+    A greenthread computing for seconds stalls the hub (live pushes, teleop); through
+    eventlet.tpool only the calling greenthread waits. `fn` must not take green locks:
+    callers keep their locks around the call, the offloaded function is pure computation.
+    Without monkey patching (scripts, seed) `fn` simply runs inline.
+    """
+    try:
+        from eventlet import patcher, tpool
+    except ImportError:
+        return fn(*args, **kwargs)
+    if not patcher.is_monkey_patched("thread"):
+        return fn(*args, **kwargs)
+    return tpool.execute(fn, *args, **kwargs)
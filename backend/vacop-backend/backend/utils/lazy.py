@@ -0,0 +1,42 @@
+import importlib
+import importlib.util
+import os
+import sys
+
+
+def lazy_enabled() -> bool:
+    return os.getenv("LAZY_IMPORTS", "1").lower() not in ("0", "false", "no", "off")
+
+
+def lazy_import(name: str):
+    """
+    Return module `name`, executed only on its first attribute access.
+
+    Used for the heavy modules (NumPy, map/planning services) so the server can start
+    serving before they are loaded; services/prewarm.py then loads them in the background.
+    LAZY_IMPORTS=0 imports eagerly (baseline for bench_startup.py).
+    """
+    module = sys.modules.get(name)
+    if module is not None:
+        return module
+    if not lazy_enabled():
+        return importlib.import_module(name)
+
+    spec = importlib.util.find_spec(name)
+    if spec is None:
+        raise ModuleNotFoundError(f"No module named {name!r}", name=name)
+    loader = importlib.util.LazyLoader(spec.loader)
+    spec.loader = loader
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[name] = module
+    loader.exec_module(module)
+
+    parent, _, child = name.rpartition(".")
+    if parent:
+        setattr(sys.modules[parent], child, module)
+    return module
+
+
+def ensure_loaded(module) -> None:
+    """Force a lazy module to execute now (any attribute access does)."""
+    getattr(module, "__name__")
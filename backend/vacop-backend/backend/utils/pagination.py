@@ -0,0 +1,91 @@
+import base64
+import json
+from datetime import datetime
+
+from sqlalchemy import tuple_
+
+
+def encode_cursor(ts: datetime, row_id: int, direction: str) -> str:
+    """
+    Build an opaque cursor pointing just past (ts, row_id).
+
+    direction:
+      - "older": the page strictly before (ts, row_id)
+      - "newer": the page strictly after (ts, row_id)
+    """
+    raw = json.dumps({"t": ts.isoformat(), "i": int(row_id), "d": direction}, separators=(",", ":"))
+    return base64.urlsafe_b64encode(raw.encode("utf-8")).decode("ascii").rstrip("=")
+
+
+def decode_cursor(token: str) -> tuple[datetime, int, str]:
+    """
+    Decode a cursor produced by encode_cursor().
+
+    Raises ValueError on any malformed token so routes can answer 400.
+    """
+    try:
+        padded = token + "=" * (-len(token) % 4)
+        data = json.loads(base64.urlsafe_b64decode(padded.encode("ascii")))
+        ts = datetime.fromisoformat(data["t"])
+        row_id = int(data["i"])
+        direction = data["d"]
+    except Exception as exc:
+        raise ValueError("Invalid cursor") from exc
+
+    if direction not in ("older", "newer"):
+        raise ValueError("Invalid cursor")
+    return ts, row_id, direction
+
+
+def keyset_page(query, ts_col, id_col, cursor: str | None, limit: int):
+    """
+    Fetch one page of `query` ordered by (ts_col, id_col) using keyset pagination.
+
+    The (ts, id) pair is unique, so ordering stays stable while new rows are inserted,
+    and each page is a single index range scan whatever its depth (no OFFSET).
+
+    Returns (rows, next_cursor, prev_cursor):
+      - rows: newest -> oldest
+      - next_cursor: older page, or None when the oldest row was reached
+      - prev_cursor: newer page, or None on the first (newest) page
+    """
+    limit = max(1, limit)
+
+    if cursor is None:
+        direction = "older"
+        q = query
+    else:
+        ts, row_id, direction = decode_cursor(cursor)
+        if direction == "older":
+            q = query.filter(tuple_(ts_col, id_col) < tuple_(ts, row_id))
+        else:
+            q = query.filter(tuple_(ts_col, id_col) > tuple_(ts, row_id))
+
+    if direction == "older":
+        q = q.order_by(ts_col.desc(), id_col.desc())
+    else:
+        q = q.order_by(ts_col.asc(), id_col.asc())
+
+    # One extra row tells us whether another page exists in that direction.
+    rows = q.limit(limit + 1).all()
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+
+    if direction == "newer":
+        rows.reverse()
+
+    if not rows:
+        return rows, None, None
+
+    ts_attr = ts_col.key
+    id_attr = id_col.key
+    newest, oldest = rows[0], rows[-1]
+
+    if direction == "older":
+        next_cursor = encode_cursor(getattr(oldest, ts_attr), getattr(oldest, id_attr), "older") if has_more else None
+        prev_cursor = encode_cursor(getattr(newest, ts_attr), getattr(newest, id_attr), "newer") if cursor else None
+    else:
+        next_cursor = encode_cursor(getattr(oldest, ts_attr), getattr(oldest, id_attr), "older")
+        prev_cursor = encode_cursor(getattr(newest, ts_attr), getattr(newest, id_attr), "newer") if has_more else None
+
+    return rows, next_cursor, prev_cursor
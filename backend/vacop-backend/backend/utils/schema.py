@@ -0,0 +1,67 @@
+import re
+
+from sqlalchemy import text
+from sqlalchemy.schema import CreateIndex
+
+from backend.extensions import db
+
+# Idempotent DDL for databases created before a column was added to the models.
+# db.create_all() only creates missing tables, never missing columns.
+SCHEMA_UPGRADES: list[str] = [
+    "ALTER TABLE missions ADD COLUMN IF NOT EXISTS robot_id VARCHAR(64) NOT NULL DEFAULT 'robot_1'",
+    "ALTER TABLE robot_positions ADD COLUMN IF NOT EXISTS raw_z BYTEA",
+]
+
+
+def ensure_schema() -> None:
+    """
+    Create missing tables and columns (must run inside an app context).
+
+    There is no migration tool in this project: new tables come from db.create_all(),
+    new columns from SCHEMA_UPGRADES, committed on their own so the app never starts on
+    a database missing a column. Indexes are left to ensure_indexes().
+    """
+    db.create_all()
+
+    with db.engine.begin() as conn:
+        # ALTER TABLE waits for the table lock behind running queries: not bounded by DB_STATEMENT_TIMEOUT_MS
+        conn.execute(text("SET LOCAL statement_timeout = 0"))
+        for stmt in SCHEMA_UPGRADES:
+            conn.execute(text(stmt))
+
+
+def _index_state(conn, name: str):
+    """True if the index exists and is valid, False if a failed build left it invalid, None if absent."""
+    return conn.execute(
+        text("SELECT i.indisvalid FROM pg_index i JOIN pg_class c ON c.oid = i.indexrelid WHERE c.relname = :name"),
+        {"name": name},
+    ).scalar()
+
+
+def ensure_indexes() -> None:
+    """
+    Create the indexes declared on the models that are missing on existing tables.
+
+    db.create_all() skips them once the table exists. Each one is built with
+    CREATE INDEX CONCURRENTLY (autocommit, one index at a time): workers already running keep
+    writing to the table during a build that can take minutes on a large robot_positions.
+    An invalid index left by an interrupted build is dropped and rebuilt.
+    The builds are not bounded by DB_STATEMENT_TIMEOUT_MS (session timeout lifted, then reset
+    before the connection goes back to the pool).
+    """
+    with db.engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+        conn.exec_driver_sql("SET statement_timeout = 0")
+        try:
+            for table in db.metadata.sorted_tables:
+                for index in table.indexes:
+                    state = _index_state(conn, index.name)
+                    if state:
+                        continue
+                    if state is False:
+                        conn.exec_driver_sql(f'DROP INDEX CONCURRENTLY IF EXISTS "{index.name}"')
+                    ddl = str(CreateIndex(index).compile(dialect=conn.dialect))
+                    conn.exec_driver_sql(re.sub(r"^CREATE (UNIQUE )?INDEX", r"CREATE \1INDEX CONCURRENTLY", ddl, count=1))
+                    print(f"[DB] index {index.name} created")
+        finally:
+            # back to the value from the connect options
+            conn.exec_driver_sql("RESET statement_timeout")
@@ -0,0 +1,84 @@
+import json
+import os
+import zlib
+
+# How the original GNSS message is kept in robot_positions (TELEMETRY_RAW_POLICY):
+#   - "full":       whole message in `raw` (JSON), the former behavior
+#   - "extra":      message in `raw` without the fields the typed columns give back exactly
+#   - "compressed": whole message deflated in `raw_z` (bytea)
+#   - "off":        nothing
+RAW_POLICIES = ("full", "extra", "compressed", "off")
+DEFAULT_RAW_POLICY = "full"
+
+# Message fields that may be rebuilt from the robot_id / lat / lng columns. "timestamp" is not
+# one of them: its original format (epoch s/ms, ISO string) is lost in the ts column.
+TYPED_FIELDS = ("robot_id", "latitude", "longitude")
+
+# Key of an "extra" payload listing the fields dropped from it
+DROPPED_KEY = "_typed"
+
+# Preset dictionary: GNSS messages are ~100 bytes, too short for deflate to find repeats
+# on its own. Never change it, stored rows are inflated with it.
+_ZDICT = b'"altitude":"fix":"satellites":"heading":"speed":{"robot_id":"robot_1","latitude":,"longitude":,"timestamp":'
+
+
+def raw_policy() -> str:
+    policy = os.getenv("TELEMETRY_RAW_POLICY", DEFAULT_RAW_POLICY).strip().lower()
+    if policy not in RAW_POLICIES:
+        print(f"[DB] unknown TELEMETRY_RAW_POLICY={policy!r}, using {DEFAULT_RAW_POLICY!r}")
+        return DEFAULT_RAW_POLICY
+    return policy
+
+
+def compress_payload(data: dict) -> bytes:
+    comp = zlib.compressobj(9, zlib.DEFLATED, -15, zdict=_ZDICT)
+    return comp.compress(json.dumps(data, separators=(",", ":")).encode("utf-8")) + comp.flush()
+
+
+def decompress_payload(blob: bytes) -> dict:
+    decomp = zlib.decompressobj(-15, zdict=_ZDICT)
+    return json.loads(decomp.decompress(bytes(blob)) + decomp.flush())
+
+
+def typed_values(robot_id, lat, lng) -> dict:
+    """Column values of a row, keyed like the message fields they come from."""
+    return {"robot_id": robot_id, "latitude": lat, "longitude": lng}
+
+
+def compact_raw(data: dict | None, policy: str, typed: dict | None = None) -> dict:
+    """
+    Values of the `raw` / `raw_z` columns for a message under `policy`.
+
+    "extra" drops a field only if `typed` (see typed_values) holds the same value with the same
+    type, so expand_raw gives the message back unchanged; without `typed` nothing is dropped.
+    """
+    if data is None or policy == "off":
+        return {"raw": None, "raw_z": None}
+    if policy == "compressed":
+        return {"raw": None, "raw_z": compress_payload(data)}
+    if policy == "full" or not typed or DROPPED_KEY in data:
+        return {"raw": data, "raw_z": None}
+    dropped = [k for k in TYPED_FIELDS
+               if k in data and type(data[k]) is type(typed.get(k)) and data[k] == typed.get(k)]
+    if not dropped:
+        return {"raw": data, "raw_z": None}
+    extra = {k: v for k, v in data.items() if k not in dropped}
+    extra[DROPPED_KEY] = dropped
+    return {"raw": extra, "raw_z": None}
+
+
+def expand_raw(raw, raw_z, typed: dict | None = None) -> dict | None:
+    """
+    Stored message as a dict, None if not kept.
+
+    An "extra" payload gets its dropped fields back from `typed` (the row's columns); without
+    `typed` it is returned as stored.
+    """
+    if raw_z is not None:
+        return decompress_payload(raw_z)
+    if not isinstance(raw, dict) or typed is None or DROPPED_KEY not in raw:
+        return raw
+    data = {k: v for k, v in raw.items() if k != DROPPED_KEY}
+    for k in raw[DROPPED_KEY]:
+        data[k] = typed[k]
+    return data
@@ -0,0 +1,82 @@
+"""
+Startup-time benchmark of the backend.
+
+Each run starts a fresh interpreter (cold imports) that imports backend.app, calls create_app()
+("serving": the point where socketio.run can accept requests), then runs the background
+prewarm and waits for it. Uses the same .env / services as the real server (DB, MQTT broker).
+
+Usage (from backend/vacop-backend):
+  python bench_startup.py              # lazy imports + prewarm (default startup)
+  python bench_startup.py --compare    # also the eager baseline (LAZY_IMPORTS=0)
+  python bench_startup.py --runs 10
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+_CHILD = r"""
+import json, sys, time, types
+t0 = time.perf_counter()
+from backend.app import create_app
+t_import = time.perf_counter()
+app = create_app()
+t_ready = time.perf_counter()
+
+heavy = [n for n in ("numpy", "backend.services.map_registry", "backend.services.planning_service")
+         if type(sys.modules.get(n)) is types.ModuleType]
+
+from backend.services.prewarm import start_prewarm, wait_prewarm, prewarm_status
+started = start_prewarm(app)
+if started:
+    wait_prewarm(600)
+t_warm = time.perf_counter()
+
+print("BENCH " + json.dumps({
+    "import_ms": (t_import - t0) * 1000,
+    "ready_ms": (t_ready - t0) * 1000,
+    "warm_ms": (t_warm - t0) * 1000,
+    "heavy_loaded_at_ready": heavy,
+    "prewarm": prewarm_status(),
+}))
+"""
+
+
+def run_once(env_overrides: dict) -> dict:
+    env = {**os.environ, **env_overrides}
+    proc = subprocess.run([sys.executable, "-c", _CHILD], env=env, capture_output=True, text=True,
+                          cwd=os.path.dirname(os.path.abspath(__file__)))
+    for line in proc.stdout.splitlines():
+        if line.startswith("BENCH "):
+            return json.loads(line[len("BENCH "):])
+    raise RuntimeError(f"benchmark child failed (exit {proc.returncode}):\n{proc.stderr[-2000:]}")
+
+
+def bench(label: str, env_overrides: dict, runs: int) -> None:
+    results = [run_once(env_overrides) for _ in range(runs)]
+    med = {k: statistics.median(r[k] for r in results) for k in ("import_ms", "ready_ms", "warm_ms")}
+    print(f"== {label} ({runs} runs, median)")
+    print(f"  import backend.app : {med['import_ms']:8.1f} ms")
+    print(f"  serving (create_app): {med['ready_ms']:8.1f} ms")
+    print(f"  warm (prewarm done) : {med['warm_ms']:8.1f} ms")
+    print(f"  heavy modules loaded when serving: {results[-1]['heavy_loaded_at_ready'] or 'none'}")
+    for name, step in results[-1]["prewarm"].get("steps", {}).items():
+        status = "ok" if step["ok"] else f"failed: {step.get('error')}"
+        print(f"    {name:<16} {step['ms']:8.1f} ms  {status}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--compare", action="store_true", help="also run the eager-import baseline")
+    args = parser.parse_args()
+
+    bench("lazy imports + prewarm", {"LAZY_IMPORTS": "1", "STARTUP_PREWARM": "1"}, args.runs)
+    if args.compare:
+        bench("eager imports (baseline)", {"LAZY_IMPORTS": "0", "STARTUP_PREWARM": "0"}, args.runs)
+
+
+if __name__ == "__main__":
+    main()
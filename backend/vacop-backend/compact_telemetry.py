@@ -0,0 +1,103 @@
+"""
+Rewrite the stored raw payload of existing robot_positions rows under a TELEMETRY_RAW_POLICY.
+
+Rows are read in primary-key order by batches (keyset on id, one short transaction per batch),
+so the tool can run against a live database and be interrupted and restarted at any time
+(--start-id resumes where it stopped).
+
+Usage (from backend/vacop-backend, same .env as the server):
+  python compact_telemetry.py --dry-run                 # sizes before/after with the configured policy
+  python compact_telemetry.py --policy extra
+  python compact_telemetry.py --policy compressed --batch-size 5000
+
+Rows stored as "off" kept no payload, there is nothing to rewrite.
+"""
+import argparse
+import json
+import time
+
+from sqlalchemy import or_, update
+
+from backend.app import create_app
+from backend.extensions import db
+from backend.models import RobotPosition
+from backend.utils.telemetry_raw import RAW_POLICIES, compact_raw, expand_raw, raw_policy, typed_values
+from backend.utils.schema import ensure_schema
+
+
+def _stored_bytes(raw, raw_z) -> int:
+    size = len(json.dumps(raw, separators=(",", ":"))) if raw is not None else 0
+    return size + (len(raw_z) if raw_z is not None else 0)
+
+
+def compact_positions(policy: str, batch_size: int = 2000, start_id: int = 0, dry_run: bool = False) -> dict:
+    """Apply `policy` to every row with a stored payload; returns row and byte counts."""
+    stats = {"scanned": 0, "updated": 0, "bytes_before": 0, "bytes_after": 0, "last_id": start_id}
+    last_id = start_id
+    while True:
+        rows = (
+            db.session.query(RobotPosition.id, RobotPosition.raw, RobotPosition.raw_z,
+                             RobotPosition.robot_id, RobotPosition.lat, RobotPosition.lng)
+            .filter(RobotPosition.id > last_id)
+            .filter(or_(RobotPosition.raw.isnot(None), RobotPosition.raw_z.isnot(None)))
+            .order_by(RobotPosition.id)
+            .limit(batch_size)
+            .all()
+        )
+        if not rows:
+            break
+
+        changes = []
+        for row_id, raw, raw_z, robot_id, lat, lng in rows:
+            raw_z = bytes(raw_z) if raw_z is not None else None
+            typed = typed_values(robot_id, lat, lng)
+            new = compact_raw(expand_raw(raw, raw_z, typed), policy, typed)
+            before = _stored_bytes(raw, raw_z)
+            after = _stored_bytes(new["raw"], new["raw_z"])
+            stats["bytes_before"] += before
+            stats["bytes_after"] += after
+            if new["raw"] != raw or new["raw_z"] != raw_z:
+                changes.append({"id": row_id, **new})
+
+        if changes and not dry_run:
+            # ORM bulk UPDATE by primary key: one executemany per batch
+            db.session.execute(update(RobotPosition), changes)
+        db.session.commit()
+
+        last_id = rows[-1][0]
+        stats["scanned"] += len(rows)
+        stats["updated"] += len(changes)
+        stats["last_id"] = last_id
+        print(f"[COMPACT] up to id {last_id}: {stats['scanned']} rows scanned, {stats['updated']} "
+              f"{'to update' if dry_run else 'updated'}")
+    return stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--policy", choices=RAW_POLICIES, default=None,
+                        help="target policy (default: TELEMETRY_RAW_POLICY)")
+    parser.add_argument("--batch-size", type=int, default=2000)
+    parser.add_argument("--start-id", type=int, default=0, help="resume after this id")
+    parser.add_argument("--dry-run", action="store_true", help="only report the sizes")
+    args = parser.parse_args()
+
+    policy = args.policy or raw_policy()
+    app = create_app()
+    with app.app_context():
+        ensure_schema()  # raw_z column on databases created before it existed
+        t0 = time.perf_counter()
+        stats = compact_positions(policy, args.batch_size, args.start_id, args.dry_run)
+
+    saved = stats["bytes_before"] - stats["bytes_after"]
+    print(f"[COMPACT] policy={policy}: {stats['updated']}/{stats['scanned']} rows "
+          f"{'would change' if args.dry_run else 'changed'} in {time.perf_counter() - t0:.1f}s, "
+          f"payload {stats['bytes_before'] / 1e6:.1f} MB -> {stats['bytes_after'] / 1e6:.1f} MB "
+          f"({saved / 1e6:.1f} MB saved)")
+    if not args.dry_run and stats["updated"]:
+        print("[COMPACT] run 'VACUUM (ANALYZE) robot_positions' so Postgres reuses the freed space "
+              "('VACUUM FULL' returns it to the OS but locks the table).")
+
+
+if __name__ == "__main__":
+    main()
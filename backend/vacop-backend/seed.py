@@ -1,6 +1,7 @@
 from backend.app import create_app
 from backend.extensions import db, bcrypt
 from backend.models import User
+from backend.utils.schema import ensure_indexes, ensure_schema
 import time
 from sqlalchemy.exc import OperationalError
 
@@ -12,7 +13,7 @@ def seed_database():
         for _ in range(30):
             try:
                 print("Tentative de connexion à la DB...")
-                db.create_all()
+                ensure_schema()
                 if not User.query.filter_by(username='admin').first():
                     print("Création de l'admin...")
                     hashed_pw = bcrypt.generate_password_hash('vacop_admin_2026').decode('utf-8')
@@ -20,10 +21,17 @@ def seed_database():
                     db.session.add(admin)
                     db.session.commit()
                     print("Admin créé.")
-                return
+                break
             except OperationalError:
                 print("DB pas encore prête, attente 2s...")
                 time.sleep(2)
 
+        # Index hors de la boucle : une construction longue ne doit pas être relancée 30 fois
+        try:
+            ensure_indexes()
+        except Exception as exc:
+            # l'app fonctionne sans (requêtes plus lentes), le prochain démarrage réessaie
+            print("Index non créés :", exc)
+
 if __name__ == "__main__":
     seed_database()